@@ -0,0 +1,231 @@
+# benchmark de clustering keys sobre las preguntas de negocio (respuestas.txt)
+#
+#   python -m benchmarks.clustering --start 2024-01 --end 2024-12
+#   python -m benchmarks.clustering --backend duckdb --duckdb-path benchmarks/work/rows_100000/NYC_TAXI.duckdb
+#
+# Por cada configuración de clustering arma una copia de la tabla (por defecto
+# SILVER.TAXI_TRIPS_ALL) ordenada por la clave y con CLUSTER BY, corre las
+# consultas analíticas (el top-10 de zonas por origen y por destino) sobre una
+# ventana de meses y registra tiempo, filas, micro-particiones escaneadas /
+# totales y bytes escaneados (de GET_QUERY_OPERATOR_STATS). Los resultados van a <schema>.CLUSTERING_BENCHMARK y
+# a benchmarks/results/clustering_<fecha>_<commit>.json.
+# Con --backend duckdb corre lo mismo contra la base local (utils.warehouse): solo
+# hay tiempos, DuckDB no expone particiones podadas.
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# configuración -> clave de clustering (None = orden de carga, sin clave)
+CONFIGS = OrderedDict([
+    ("none",              None),
+    ("pickup_date",       "CAST(PICKUP_DATETIME AS DATE)"),
+    ("date_zone_service", "CAST(PICKUP_DATETIME AS DATE), PULOCATION_ID, SERVICE_TYPE"),
+    ("month_service",     "DATE_TRUNC('month', PICKUP_DATETIME), SERVICE_TYPE"),
+])
+
+WINDOW = "PICKUP_DATETIME >= '{start}' AND PICKUP_DATETIME < '{end}'"
+
+# las cuatro preguntas de respuestas.txt sobre las columnas de silver; el top-10 de
+# zonas se mide por origen y por destino, así cada clave se prueba en los dos accesos
+QUERIES = OrderedDict([
+    ("zone_month_top10", """
+        SELECT DATE_TRUNC('month', PICKUP_DATETIME) AS MONTH, PULOCATION_ID, COUNT(*) AS TRIPS
+        FROM {table}
+        WHERE {window}
+        GROUP BY 1, 2
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY DATE_TRUNC('month', PICKUP_DATETIME)
+                                   ORDER BY COUNT(*) DESC) <= 10
+    """),
+    ("zone_month_top10_dropoff", """
+        SELECT DATE_TRUNC('month', PICKUP_DATETIME) AS MONTH, DOLOCATION_ID, COUNT(*) AS TRIPS
+        FROM {table}
+        WHERE {window}
+        GROUP BY 1, 2
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY DATE_TRUNC('month', PICKUP_DATETIME)
+                                   ORDER BY COUNT(*) DESC) <= 10
+    """),
+    ("borough_revenue_tips", """
+        SELECT DATE_TRUNC('month', PICKUP_DATETIME) AS MONTH, PU_BOROUGH,
+               SUM(TOTAL_AMOUNT) AS TOTAL_REVENUE, SUM(TIP_AMOUNT) AS TOTAL_TIPS,
+               SUM(TIP_AMOUNT) / NULLIF(SUM(TOTAL_AMOUNT), 0) * 100 AS TIP_PERCENT
+        FROM {table}
+        WHERE {window}
+        GROUP BY 1, 2
+    """),
+    ("speed_day_night", """
+        SELECT PU_BOROUGH,
+               CASE WHEN HOUR(PICKUP_DATETIME) BETWEEN 6 AND 17 THEN 'day' ELSE 'night' END AS DAYPART,
+               AVG(TRIP_DISTANCE / NULLIF(DATEDIFF('second', PICKUP_DATETIME, DROPOFF_DATETIME), 0) * 3600) AS AVG_MPH
+        FROM {table}
+        WHERE {window}
+          AND DROPOFF_DATETIME > PICKUP_DATETIME
+        GROUP BY 1, 2
+    """),
+    ("duration_p50_p90", """
+        SELECT PULOCATION_ID,
+               PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY DATEDIFF('minute', PICKUP_DATETIME, DROPOFF_DATETIME)) AS P50_MIN,
+               PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY DATEDIFF('minute', PICKUP_DATETIME, DROPOFF_DATETIME)) AS P90_MIN
+        FROM {table}
+        WHERE {window}
+        GROUP BY 1
+    """),
+])
+
+RESULTS_TABLE = "CLUSTERING_BENCHMARK"
+RESULTS_DDL = """(
+    RUN_ID STRING, BACKEND STRING, GIT_COMMIT STRING, SOURCE_TABLE STRING, CONFIG STRING,
+    CLUSTER_KEY STRING, QUERY_NAME STRING, REPEAT NUMBER, QUERY_ID STRING, ELAPSED_SEC FLOAT,
+    ROWS_RETURNED NUMBER, PARTITIONS_SCANNED NUMBER, PARTITIONS_TOTAL NUMBER, BYTES_SCANNED NUMBER,
+    WINDOW_START STRING, WINDOW_END STRING, RUN_TS TIMESTAMP_NTZ)"""
+
+
+def month_bounds(start, end):
+    """
+    '2024-01', '2024-12' -> ('2024-01-01', '2025-01-01') (fin exclusivo).
+    """
+    y, m = (int(x) for x in end.split("-"))
+    y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return f"{start}-01", f"{y}-{m:02d}-01"
+
+
+def build_copy(cur, source_ref, copy_ref, cluster_key):
+    """
+    Copia de la tabla con la clave de clustering ya aplicada: el ORDER BY deja las
+    micro-particiones ordenadas desde el inicio, sin esperar al auto-clustering.
+    """
+    if cluster_key is None:
+        cur.execute(f"CREATE OR REPLACE TRANSIENT TABLE {copy_ref} AS SELECT * FROM {source_ref}")
+    else:
+        cur.execute(f"CREATE OR REPLACE TRANSIENT TABLE {copy_ref} CLUSTER BY ({cluster_key}) "
+                    f"AS SELECT * FROM {source_ref} ORDER BY {cluster_key}")
+
+
+def scan_stats(cur, query_id):
+    """
+    (particiones escaneadas, particiones totales, bytes escaneados) sumados sobre
+    los TableScan de la consulta.
+    """
+    cur.execute(f"""
+        SELECT SUM(OPERATOR_STATISTICS:pruning:partitions_scanned::NUMBER),
+               SUM(OPERATOR_STATISTICS:pruning:partitions_total::NUMBER),
+               SUM(OPERATOR_STATISTICS:io:bytes_scanned::NUMBER)
+        FROM TABLE(GET_QUERY_OPERATOR_STATS('{query_id}'))
+        WHERE OPERATOR_TYPE = 'TableScan'
+    """)
+    return cur.fetchone()
+
+
+def run_query(cur, backend, sql):
+    start = time.perf_counter()
+    cur.execute(sql)
+    rows = len(cur.fetchall())
+    elapsed = time.perf_counter() - start
+    query_id = getattr(cur, "sfqid", None)
+    scanned = total = bytes_scanned = None
+    if backend == "snowflake" and query_id:
+        scanned, total, bytes_scanned = scan_stats(cur, query_id)
+    return {"query_id": query_id, "elapsed_sec": round(elapsed, 4), "rows_returned": rows,
+            "partitions_scanned": scanned, "partitions_total": total, "bytes_scanned": bytes_scanned}
+
+
+def save_results(cur, results_ref, rows):
+    if not rows:
+        return
+    cols = ["RUN_ID", "BACKEND", "GIT_COMMIT", "SOURCE_TABLE", "CONFIG", "CLUSTER_KEY", "QUERY_NAME",
+            "REPEAT", "QUERY_ID", "ELAPSED_SEC", "ROWS_RETURNED", "PARTITIONS_SCANNED",
+            "PARTITIONS_TOTAL", "BYTES_SCANNED", "WINDOW_START", "WINDOW_END"]
+    placeholders = "(" + ",".join(["%s"] * len(cols)) + ",CURRENT_TIMESTAMP())"
+    cur.execute(
+        f"INSERT INTO {results_ref} ({','.join(cols)},RUN_TS) VALUES " + ", ".join([placeholders] * len(rows)),
+        [row[c.lower()] for row in rows for c in cols],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de clustering keys sobre las consultas de negocio")
+    parser.add_argument("--backend", choices=("snowflake", "duckdb"), default=None,
+                        help="por defecto WAREHOUSE_BACKEND (o snowflake)")
+    parser.add_argument("--duckdb-path", default=None, help="base local para --backend duckdb")
+    parser.add_argument("--table", default="SILVER.TAXI_TRIPS_ALL", help="schema.tabla con columnas de silver")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="configuraciones separadas por coma")
+    parser.add_argument("--queries", default=",".join(QUERIES), help="consultas separadas por coma")
+    parser.add_argument("--start", default="2024-01", help="primer mes de la ventana (yyyy-mm)")
+    parser.add_argument("--end", default="2024-12", help="último mes de la ventana (yyyy-mm)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results-schema", default="BENCH")
+    parser.add_argument("--keep-copies", action="store_true", help="no borrar las copias clusterizadas")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        os.environ["WAREHOUSE_BACKEND"] = args.backend
+    if args.duckdb_path:
+        os.environ["DUCKDB_PATH"] = args.duckdb_path
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.run import git_commit
+    from utils.warehouse import acquire_connection, backend_name, release_connection
+
+    backend = backend_name()
+    schema, table = args.table.split(".")
+    start, end = month_bounds(args.start, args.end)
+    window = WINDOW.format(start=start, end=end)
+    commit = git_commit()
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    run_id = f"clustering_{stamp}_{commit}"
+
+    conn, sf_database, _ = acquire_connection(schema=schema)
+    cur = conn.cursor()
+    source_ref = f"{sf_database}.{schema}.{table}"
+    results_ref = f"{sf_database}.{args.results_schema}.{RESULTS_TABLE}"
+    # sin caché de resultados: la segunda repetición tiene que volver a escanear
+    cur.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {sf_database}.{args.results_schema}")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {results_ref} {RESULTS_DDL}")
+
+    results = []
+    try:
+        for config in [c.strip() for c in args.configs.split(",")]:
+            cluster_key = CONFIGS[config]
+            copy_ref = f"{sf_database}.{args.results_schema}.{table}__CLU_{config.upper()}"
+            t0 = time.perf_counter()
+            build_copy(cur, source_ref, copy_ref, cluster_key)
+            print(f"🧱 {config}: {copy_ref} ({time.perf_counter() - t0:.1f}s)")
+
+            rows = []
+            for name in [q.strip() for q in args.queries.split(",")]:
+                sql = QUERIES[name].format(table=copy_ref, window=window)
+                for rep in range(1, args.repeat + 1):
+                    res = run_query(cur, backend, sql)
+                    rows.append({"run_id": run_id, "backend": backend, "git_commit": commit,
+                                 "source_table": source_ref, "config": config, "cluster_key": cluster_key,
+                                 "query_name": name, "repeat": rep, "window_start": start,
+                                 "window_end": end, **res})
+                    pruning = (f", {res['partitions_scanned']}/{res['partitions_total']} particiones"
+                               if res["partitions_total"] is not None else "")
+                    print(f"   {name} #{rep}: {res['elapsed_sec']}s{pruning}")
+            save_results(cur, results_ref, rows)
+            results.extend(rows)
+            if not args.keep_copies:
+                cur.execute(f"DROP TABLE IF EXISTS {copy_ref}")
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"{run_id}.json")
+    with open(out_path, "w") as f:
+        json.dump({"run_id": run_id, "backend": backend, "commit": commit, "table": source_ref,
+                   "window": [start, end], "results": results}, f, indent=2, default=str)
+    print(f"\n📄 Resultados en {out_path} y {results_ref}")
+    return out_path
+
+
+if __name__ == "__main__":
+    main()
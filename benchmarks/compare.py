@@ -0,0 +1,55 @@
+# compara dos corridas de benchmarks.run
+#
+#   python -m benchmarks.compare benchmarks/results/A.json benchmarks/results/B.json
+#
+# Por escenario/mes/escala muestra el tiempo total, el pico de memoria y los
+# segundos por etapa de ambas corridas con la variación porcentual (B vs A).
+
+import argparse
+import json
+
+
+def _key(res):
+    return (res["scenario"], res["rows"], res["year"], res["month"])
+
+
+def _delta(old, new):
+    if not old or new is None:
+        return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(path_a, path_b):
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+    by_key = {_key(r): r for r in a["results"]}
+
+    print(f"A = {a['commit']} {a.get('label', '')}   B = {b['commit']} {b.get('label', '')}\n")
+    for new in b["results"]:
+        old = by_key.get(_key(new))
+        scenario, rows, year, month = _key(new)
+        print(f"{scenario} {year}-{month:02d} rows={rows}")
+        if old is None:
+            print("   (sin par en A)")
+            continue
+        print(f"   {'wall_sec':<16}{old['wall_sec']:>10}{new['wall_sec']:>10}  {_delta(old['wall_sec'], new['wall_sec'])}")
+        print(f"   {'peak_rss_mb':<16}{old['peak_rss_mb']:>10}{new['peak_rss_mb']:>10}  "
+              f"{_delta(old['peak_rss_mb'], new['peak_rss_mb'])}")
+        for stage in list(dict.fromkeys(list(old["stages"]) + list(new["stages"]))):
+            s_old = old["stages"].get(stage, {}).get("seconds")
+            s_new = new["stages"].get(stage, {}).get("seconds")
+            print(f"   {stage:<16}{str(s_old or '-'):>10}{str(s_new or '-'):>10}  {_delta(s_old, s_new)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks.run")
+    parser.add_argument("a")
+    parser.add_argument("b")
+    args = parser.parse_args(argv)
+    compare(args.a, args.b)
+
+
+if __name__ == "__main__":
+    main()
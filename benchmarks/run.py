@@ -0,0 +1,202 @@
+# corre los loaders de bronze y silver contra DuckDB con datos sintéticos
+# (WAREHOUSE_BACKEND=duckdb, ver utils.warehouse)
+#
+#   python -m benchmarks.run --rows 100000,1000000 --months 2015-01,2025-01
+#
+# Cada escenario corre en un proceso aparte (pico de memoria limpio) contra la
+# misma base DuckDB del workdir, así silver_*_from_bronze lee lo que cargó el
+# escenario de bronze anterior. Los spans de utils.metrics de cada escenario se
+# agregan por etapa y el resultado queda en benchmarks/results/<fecha>_<commit>.json
+# para comparar corridas con benchmarks.compare.
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# escenario -> (archivo del bloque, función, servicio, kwargs extra)
+SCENARIOS = OrderedDict([
+    ("bronze_yellow_variant",     ("data_loaders/ny_yellow_taxi_ingest.py", "load_yellow_month_chunked_v2", "yellow", {})),
+    ("bronze_yellow_typed",       ("data_loaders/ny_yellow_taxi_ingest.py", "load_yellow_month_chunked_v2", "yellow", {"ingest_mode": "typed"})),
+    ("bronze_green_variant",      ("data_loaders/ingest_green_taxi.py", "load_green_month_chunked", "green", {})),
+    ("bronze_green_typed",        ("data_loaders/ingest_green_taxi.py", "load_green_month_chunked", "green", {"ingest_mode": "typed"})),
+    ("bronze_yellow_parts",       ("data_loaders/ny_yellow_taxi_ingest.py", "load_yellow_month_chunked_v2", "yellow", {"upload_mode": "parts"})),
+    ("bronze_green_typed_parts",  ("data_loaders/ingest_green_taxi.py", "load_green_month_chunked", "green", {"ingest_mode": "typed", "upload_mode": "parts"})),
+    ("bronze_yellow_inflight",    ("data_loaders/ny_yellow_taxi_ingest.py", "load_yellow_month_chunked_v2", "yellow", {"max_in_flight": 4})),
+    ("bronze_green_inflight",     ("data_loaders/ingest_green_taxi.py", "load_green_month_chunked", "green", {"max_in_flight": 4})),
+    ("silver_yellow_file",        ("data_loaders/silver_all_yellow_trips.py", "load_yellow_to_silver", "yellow", {})),
+    ("silver_green_file",         ("data_loaders/yellow_taxis_silver.py", "load_green_to_silver", "green", {})),
+    ("silver_green_parts",        ("data_loaders/yellow_taxis_silver.py", "load_green_to_silver", "green", {"upload_mode": "parts"})),
+    ("silver_yellow_inflight",    ("data_loaders/silver_all_yellow_trips.py", "load_yellow_to_silver", "yellow", {"max_in_flight": 4})),
+    ("silver_yellow_from_bronze", ("data_loaders/silver_all_yellow_trips.py", "load_yellow_to_silver", "yellow", {"source": "bronze"})),
+    ("silver_green_from_bronze",  ("data_loaders/yellow_taxis_silver.py", "load_green_to_silver", "green", {"source": "bronze"})),
+])
+
+
+def load_block(rel_path):
+    """
+    Importa un bloque de Mage como módulo, con data_loader ya definido (igual que
+    lo hace Mage) para no depender de mage_ai.
+    """
+    path = os.path.join(REPO_ROOT, rel_path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    module.data_loader = lambda fn: fn
+    spec.loader.exec_module(module)
+    return module
+
+
+def local_remote_fingerprint(url, timeout=60):
+    """
+    Huella "remota" del archivo sintético local (sin HTTP).
+    """
+    path = os.path.join("data", "nyc_tlc", url.rsplit("/", 1)[-1])
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"etag": f"{stat.st_size}-{int(stat.st_mtime)}", "last_modified": None,
+            "bytes": stat.st_size}
+
+
+def summarize_spans(path):
+    """
+    Agrega los spans por etapa: cantidad, segundos, filas, bytes y throughput.
+    """
+    stages = OrderedDict()
+    if not os.path.exists(path):
+        return stages
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            st = stages.setdefault(rec["stage"], {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "errors": 0})
+            st["count"] += 1
+            st["seconds"] += rec.get("elapsed_sec") or 0.0
+            st["rows"] += rec.get("rows") or 0
+            st["bytes"] += rec.get("bytes") or 0
+            st["errors"] += rec.get("status") == "ERROR"
+    for st in stages.values():
+        st["seconds"] = round(st["seconds"], 4)
+        st["rows_per_sec"] = round(st["rows"] / st["seconds"], 1) if st["rows"] and st["seconds"] else None
+        st["bytes_per_sec"] = round(st["bytes"] / st["seconds"], 1) if st["bytes"] and st["seconds"] else None
+    return stages
+
+
+def run_scenario(workdir, scenario, year, month, chunk_size):
+    """
+    Corre un escenario en el proceso actual (lo llama el proceso hijo).
+    """
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    os.environ["WAREHOUSE_BACKEND"] = "duckdb"
+    os.environ["DUCKDB_PATH"] = os.path.join(workdir, "NYC_TAXI.duckdb")
+    import utils.fingerprints
+    import utils.metrics
+    from utils import duckdb_backend
+
+    rel_path, fn_name, service, extra = SCENARIOS[scenario]
+    spans_path = os.path.join(workdir, "spans", f"{scenario}_{year}{month:02d}.jsonl")
+    if os.path.exists(spans_path):
+        os.remove(spans_path)
+    utils.metrics.METRICS_PATH = spans_path
+
+    block = load_block(rel_path)
+    for module in (block, utils.fingerprints):
+        if hasattr(module, "remote_fingerprint"):
+            module.remote_fingerprint = local_remote_fingerprint
+
+    start = time.perf_counter()
+    error = None
+    try:
+        res = getattr(block, fn_name)(year=year, month=month, chunk_size=chunk_size, force=True, **extra)
+    except Exception as e:
+        res, error = {}, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    duckdb_backend.shutdown()
+
+    return {
+        "scenario": scenario,
+        "service": service,
+        "year": year,
+        "month": month,
+        "wall_sec": round(wall, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rows_in_file": res.get("rows_in_file"),
+        "rows_inserted": res.get("rows_inserted"),
+        "error": error,
+        "stages": summarize_spans(spans_path),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline de los loaders (DuckDB + Parquet sintético)")
+    parser.add_argument("--rows", default="100000", help="filas por archivo, separadas por coma (100000 … 20000000)")
+    parser.add_argument("--months", default="2015-01,2025-01", help="meses yyyy-mm (definen la deriva de esquema)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="escenarios separados por coma")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--workdir", default=os.path.join(REPO_ROOT, "benchmarks", "work"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="etiqueta libre para el archivo de resultados")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.synthetic import write_month
+
+    rows_list = [int(r) for r in args.rows.split(",")]
+    months = [tuple(int(x) for x in m.split("-")) for m in args.months.split(",")]
+    scenarios = [s.strip() for s in args.scenarios.split(",")]
+    ctx = multiprocessing.get_context("spawn")
+
+    results = []
+    for rows in rows_list:
+        # un workdir por escala: base DuckDB y archivos sintéticos propios
+        workdir = os.path.join(os.path.abspath(args.workdir), f"rows_{rows}")
+        src_dir = os.path.join(workdir, "data", "nyc_tlc")
+        for year, month in months:
+            for service in ("yellow", "green"):
+                t0 = time.perf_counter()
+                write_month(service, year, month, rows, src_dir, seed=args.seed)
+                print(f"🧪 {service} {year}-{month:02d}: {rows} filas sintéticas ({time.perf_counter() - t0:.1f}s)")
+
+        for scenario in scenarios:
+            for year, month in months:
+                with ctx.Pool(1) as pool:
+                    res = pool.apply(run_scenario, (workdir, scenario, year, month, args.chunk_size))
+                res["rows"] = rows
+                results.append(res)
+                status = "❌ " + res["error"] if res["error"] else "✅"
+                print(f"{status} {scenario} {year}-{month:02d} rows={rows}: {res['wall_sec']}s, "
+                      f"pico {res['peak_rss_mb']} MB")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = git_commit()
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    suffix = f"_{args.label}" if args.label else ""
+    out_path = os.path.join(RESULTS_DIR, f"{stamp}_{commit}{suffix}.json")
+    with open(out_path, "w") as f:
+        json.dump({"commit": commit, "created_utc": stamp, "label": args.label,
+                   "chunk_size": args.chunk_size, "results": results}, f, indent=2)
+    print(f"\n📄 Resultados en {out_path}")
+    return out_path
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# archivos Parquet sintéticos con la forma de los de NYC TLC
+#
+# Genera yellow/green por mes con los tipos y la deriva de nombres de la fuente
+# real: congestion_surcharge desde 2019, airport_fee en 2022 y Airport_fee desde
+# 2023, cbd_congestion_fee desde 2025, passenger_count/RatecodeID como double
+# desde 2020. Incluye una fracción de filas que las reglas de silver descartan
+# (distancias/montos negativos, viajes de más de 24h). Se escribe de a un row
+# group para que 20M filas no necesiten 20M filas en memoria.
+
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROW_GROUP_SIZE = 1_000_000
+US_PER_MIN = 60_000_000
+
+
+def source_columns(service, year):
+    """
+    Lista de (nombre, tipo arrow) en el orden en que la fuente publica el archivo.
+    """
+    count_type = pa.float64() if year >= 2020 else pa.int64()
+    prefix = "tpep" if service == "yellow" else "lpep"
+    cols = [
+        ("VendorID", pa.int64()),
+        (f"{prefix}_pickup_datetime", pa.timestamp("us")),
+        (f"{prefix}_dropoff_datetime", pa.timestamp("us")),
+    ]
+    if service == "yellow":
+        cols += [("passenger_count", count_type), ("trip_distance", pa.float64()),
+                 ("RatecodeID", count_type), ("store_and_fwd_flag", pa.string()),
+                 ("PULocationID", pa.int64()), ("DOLocationID", pa.int64()),
+                 ("payment_type", pa.int64())]
+    else:
+        cols += [("store_and_fwd_flag", pa.string()), ("RatecodeID", count_type),
+                 ("PULocationID", pa.int64()), ("DOLocationID", pa.int64()),
+                 ("passenger_count", count_type), ("trip_distance", pa.float64())]
+    cols += [(name, pa.float64()) for name in
+             ("fare_amount", "extra", "mta_tax", "tip_amount", "tolls_amount")]
+    if service == "green":
+        cols.append(("ehail_fee", pa.float64()))
+    cols += [("improvement_surcharge", pa.float64()), ("total_amount", pa.float64())]
+    if service == "green":
+        cols += [("payment_type", count_type), ("trip_type", count_type)]
+    if year >= 2019:
+        cols.append(("congestion_surcharge", pa.float64()))
+    if service == "yellow" and year >= 2022:
+        cols.append(("airport_fee" if year == 2022 else "Airport_fee", pa.float64()))
+    if year >= 2025:
+        cols.append(("cbd_congestion_fee", pa.float64()))
+    return cols
+
+
+def synth_batch(service, year, month, n, rng):
+    """
+    n filas sintéticas del mes como pa.Table con el esquema de source_columns.
+    """
+    prefix = "tpep" if service == "yellow" else "lpep"
+    start = np.datetime64(f"{year}-{month:02d}-01", "us").astype(np.int64)
+    pickup = start + rng.integers(0, 28 * 24 * 60, n) * US_PER_MIN + rng.integers(0, US_PER_MIN, n)
+    minutes = rng.exponential(15.0, n)
+    minutes[rng.random(n) < 0.002] += 26 * 60  # viajes > 24h
+    dropoff = pickup + (minutes * US_PER_MIN).astype(np.int64)
+
+    distance = np.round(rng.gamma(1.8, 1.7, n), 2)
+    distance[rng.random(n) < 0.001] *= -1
+    fare = np.round(3.0 + distance * 2.5 + rng.normal(0, 1.0, n), 2)
+    tip = np.round(np.where(rng.random(n) < 0.6, fare * rng.uniform(0.1, 0.3, n), 0.0), 2)
+    extra = rng.choice([0.0, 0.5, 1.0], n)
+    tolls = np.where(rng.random(n) < 0.05, 6.55, 0.0)
+    total = np.round(fare + tip + extra + tolls + 0.5 + 0.3, 2)
+    refunds = rng.random(n) < 0.01
+    total[refunds] *= -1
+
+    values = {
+        "VendorID": rng.integers(1, 3, n),
+        f"{prefix}_pickup_datetime": pickup,
+        f"{prefix}_dropoff_datetime": dropoff,
+        "passenger_count": rng.integers(0, 7, n),
+        "trip_distance": distance,
+        "RatecodeID": rng.choice([1, 1, 1, 1, 2, 3, 4, 5, 99], n),
+        "store_and_fwd_flag": rng.choice(np.array(["N", "Y"], dtype=object), n, p=[0.99, 0.01]),
+        "PULocationID": rng.integers(1, 266, n),
+        "DOLocationID": rng.integers(1, 266, n),
+        "payment_type": rng.choice([1, 1, 1, 2, 2, 3, 4], n),
+        "fare_amount": fare,
+        "extra": extra,
+        "mta_tax": np.full(n, 0.5),
+        "tip_amount": tip,
+        "tolls_amount": tolls,
+        "ehail_fee": None,
+        "improvement_surcharge": np.full(n, 0.3),
+        "total_amount": total,
+        "trip_type": rng.choice([1, 1, 1, 2], n),
+        "congestion_surcharge": rng.choice([0.0, 2.5], n),
+        "airport_fee": np.where(rng.random(n) < 0.08, 1.75, 0.0),
+        "Airport_fee": np.where(rng.random(n) < 0.08, 1.75, 0.0),
+        "cbd_congestion_fee": rng.choice([0.0, 0.75], n),
+    }
+
+    arrays, fields = [], []
+    for name, typ in source_columns(service, year):
+        data = values[name]
+        if data is None:
+            arrays.append(pa.nulls(n, type=typ))
+        elif pa.types.is_timestamp(typ):
+            arrays.append(pa.array(data, type=pa.int64()).cast(typ))
+        elif pa.types.is_floating(typ) and name in ("passenger_count", "RatecodeID", "payment_type", "trip_type"):
+            arrays.append(pa.array(data.astype(np.float64), type=typ))
+        else:
+            arrays.append(pa.array(data, type=typ))
+        fields.append(pa.field(name, typ))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def write_month(service, year, month, rows, dest_dir, *, seed=0, row_group_size=ROW_GROUP_SIZE):
+    """
+    Escribe dest_dir/<service>_tripdata_<yyyy>-<mm>.parquet con rows filas (de a
+    un row group) y devuelve la ruta. Si ya existe con ese tamaño se reutiliza.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, f"{service}_tripdata_{year}-{month:02d}.parquet")
+    if os.path.exists(path) and pq.ParquetFile(path).metadata.num_rows == rows:
+        return path
+
+    rng = np.random.default_rng([seed, year, month, 0 if service == "yellow" else 1])
+    schema = pa.schema(source_columns(service, year))
+    part_path = path + ".part"
+    with pq.ParquetWriter(part_path, schema, compression="snappy") as writer:
+        written = 0
+        while written < rows:
+            n = min(row_group_size, rows - written)
+            writer.write_table(synth_batch(service, year, month, n, rng))
+            written += n
+    os.replace(part_path, path)
+    return path
@@ -0,0 +1,29 @@
+if 'data_exporter' not in globals():
+    from mage_ai.data_preparation.decorators import data_exporter
+
+from utils.bulk_export import export_partitions
+from utils.flags import parse_flag
+
+
+@data_exporter
+def export_trips_to_parquet(*args, **kwargs):
+    """
+    Extrae una tabla de silver / gold a Parquet local (zstd) particionado por
+    service=/year=/month=, leyendo el resultado en batches de Arrow.
+    Variables del pipeline:
+    table (default SILVER.TAXI_TRIPS_ALL), start / end ('yyyy-mm', inclusive),
+    out_dir (default data/exports/<tabla>), max_workers (particiones a la vez),
+    service_column / date_column (para gold: SERVICE_TYPE / TRIP_MONTH),
+    force=True vuelve a exportar particiones ya completas.
+    Es reanudable: las particiones con _SUCCESS y las mismas filas se saltean.
+    """
+    return export_partitions(
+        kwargs.get('table', 'SILVER.TAXI_TRIPS_ALL'),
+        kwargs.get('start', '2015-01'),
+        kwargs.get('end', '2025-12'),
+        out_dir=kwargs.get('out_dir'),
+        service_col=kwargs.get('service_column', 'SERVICE_TYPE'),
+        date_col=kwargs.get('date_column', 'PICKUP_DATETIME'),
+        max_workers=int(kwargs.get('max_workers', 4)),
+        force=parse_flag(kwargs.get('force', False)),
+    )
@@ -2,113 +2,179 @@
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
 
-import os, time, requests
+import os
 import pyarrow.parquet as pq
-import snowflake.connector
-from mage_ai.data_preparation.shared.secrets import get_secret_value
+from functools import partial
 from datetime import datetime
+from utils.arrow_prep import prepare_for_upload
+from utils.audit import AUDIT_COLUMNS, AuditWriter
+from utils.backfill import month_range, run_months, run_months_pipelined, tmp_table_name
+from utils.chunk_runner import run_chunks
+from utils.checkpoints import clear_checkpoints, commit_chunk, ensure_checkpoint_table, resume_chunks
+from utils.downloads import SourceNotFound, ensure_local_file
+from utils.fingerprints import (check_unchanged, invalidate_fingerprint, local_fingerprint,
+                                remote_fingerprint, record_fingerprint, source_unchanged)
+from utils.flags import parse_flag
+from utils.metrics import collect_spans, set_tags, span
+from utils.publish import create_side_table, publish_month, side_table_name
+from utils.retry import run_with_retries
+from utils.run_results import save_run_results
+from utils.silver_build import build_silver_month
+from utils.warehouse import acquire_connection, close_all, release_connection
+from utils.staging import copy_to_chunked_staging, create_parquet_stage, drop_staging, put_file, split_parquet
+from utils.typed_copy import GREEN_BRONZE_SPEC, SchemaMismatch, resolve_columns, typed_copy
 
 BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data"
+DEST_DIR = "data/nyc_tlc"
+STAGE_NAME = "TAXI_STAGE"
 
-def need(name, val):
-    if not val:
-        raise Exception(f"Falta el secret '{name}' en Mage (Settings → Secrets).")
-    return val
-
-
-def load_green_month_chunked(*, year:int, month:int, chunk_size:int=1_000_000, max_retries:int=3):
+def load_green_month_chunked(*, year:int, month:int, chunk_size:int=1_000_000, max_retries:int=3,
+                             tmp_table:str=None, staged:bool=False, preprocess:bool=False, force:bool=False,
+                             ingest_mode:str="variant", publish_mode:str="delete",
+                             build_silver:bool=False, audit_metrics:bool=False, upload_mode:str="single",
+                             max_in_flight:int=1):
     service    = "green"
-    dest_dir   = "data/nyc_tlc"
-    stage_name = "TAXI_STAGE"
     table_name = "GREEN_TRIPS"             # tabla final de datos
     meta_table = "GREEN_TRIPS_METADATA"    # tabla de metadatos
-    tmp_table  = "_TMP_RAW_VARIANT"        # staging temporal
+    tmp_table  = tmp_table or tmp_table_name(service, year, month)  # staging temporal
 
-    os.makedirs(dest_dir, exist_ok=True)
+    os.makedirs(DEST_DIR, exist_ok=True)
     fname = f"{service}_tripdata_{year}-{month:02d}.parquet"
     url = f"{BASE_URL}/{fname}"
-    local_path = os.path.join(dest_dir, fname)
-
-    # -------- credenciales --------
-    sf_user      = need("SNOWFLAKE_USER",      get_secret_value("SNOWFLAKE_USER"))
-    sf_password  = need("SNOWFLAKE_PASSWORD",  get_secret_value("SNOWFLAKE_PASSWORD"))
-    sf_account   = need("SNOWFLAKE_ACCOUNT",   get_secret_value("SNOWFLAKE_ACCOUNT"))
-    sf_warehouse = get_secret_value("SNOWFLAKE_WAREHOUSE") or "WH_INGEST"
-    sf_database  = get_secret_value("SNOWFLAKE_DATABASE")  or "NYC_TAXI"
-    sf_schema    = get_secret_value("SNOWFLAKE_SCHEMA")    or "RAW"
-
-    conn = snowflake.connector.connect(
-        user=sf_user,
-        password=sf_password,
-        account=sf_account,
-        role="SYSADMIN",
-        warehouse=sf_warehouse,
-        database=sf_database,
-        schema=sf_schema,
-        insecure_mode=True
-    )
+    local_path = os.path.join(DEST_DIR, fname)
+    set_tags(service=service, year=year, month=month, file=fname)
+
+    conn, sf_database, sf_schema = acquire_connection(default_schema="RAW")
     cur = conn.cursor()
+    audit = AuditWriter(cur, f"{sf_database}.{sf_schema}.{meta_table}", AUDIT_COLUMNS,
+                        spool_key=f"{service}_{year}{month:02d}", ts_column="INGEST_TS",
+                        metric_columns=audit_metrics)
 
     # -------- objetos base --------
-    cur.execute(f"CREATE FILE FORMAT IF NOT EXISTS {sf_database}.{sf_schema}.PARQUET_FORMAT TYPE=PARQUET")
-    cur.execute(f"CREATE STAGE IF NOT EXISTS {sf_database}.{sf_schema}.{stage_name} "
-                f"FILE_FORMAT={sf_database}.{sf_schema}.PARQUET_FORMAT")
+    create_parquet_stage(cur, f"{sf_database}.{sf_schema}", STAGE_NAME)
+
+    # -------- detección de cambios en la fuente --------
+    remote_fp = None
+    if not force:
+        unchanged, remote_fp, stored_fp = check_unchanged(cur, f"{sf_database}.{sf_schema}", table_name, fname, url)
+        if unchanged:
+            audit.close()
+            cur.close(); release_connection(conn)
+            print(f"⏭️ {fname} sin cambios desde la última carga OK, se omite (force=True para recargar)")
+            return {"file": fname, "year": year, "month": month, "status": "SKIPPED",
+                    "rows_in_file": stored_fp["rows_in_file"], "rows_inserted": 0}
 
     # -------- descarga parquet --------
-    if not os.path.exists(local_path):
-        print(f"Descargando {url} …")
-        r = requests.get(url, timeout=180)
-        if r.status_code == 404:
+    if not staged:
+        try:
+            ensure_local_file(url, local_path, remote=remote_fp)
+        except SourceNotFound:
             run_id = f"{service}_{year}{month:02d}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-            cur.execute(f"""
-                INSERT INTO {sf_database}.{sf_schema}.{meta_table}
-                (RUN_ID,SERVICE,YEAR,MONTH,SOURCE_FILE,STATUS,ERROR_MESSAGE,INGEST_TS)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP())
-            """, (run_id, service, year, month, fname, 'MISSING', 'HTTP 404'))
-            cur.close(); conn.close()
+            audit.add(run_id, service, year, month, fname, None, None, None, 0, 'MISSING', 'HTTP 404')
+            audit.close()
+            cur.close(); release_connection(conn)
             print(f"⚠️ Archivo no encontrado: {url}. Marcado MISSING en metadatos.")
             return {"file": fname, "status": "MISSING"}
-        r.raise_for_status()
-        with open(local_path, 'wb') as f:
-            f.write(r.content)
 
-    pf = pq.ParquetFile(local_path)
-    rows_in_file = pf.metadata.num_rows
+    with span("parquet_open", bytes=os.path.getsize(local_path)) as sp:
+        pf = pq.ParquetFile(local_path)
+        sp["rows"] = rows_in_file = pf.metadata.num_rows
+    rows_staged = rows_in_file
+
+    # -------- preprocesamiento local (opcional) --------
+    upload_path = local_path
+    if preprocess:
+        upload_path, rows_staged = prepare_for_upload(local_path, service)
+        pf = pq.ParquetFile(upload_path)
+
+    # -------- partes por row group (upload_mode="parts") --------
+    parts = split_parquet(upload_path) if upload_mode == "parts" else None
+
+    # la huella anterior deja de valer antes de tocar los datos del mes
+    invalidate_fingerprint(cur, f"{sf_database}.{sf_schema}", table_name, fname)
+
+    # -------- checkpoints: ¿quedó el mes a medias en una corrida anterior? --------
+    side_table = side_table_name(table_name, year, month, service) if publish_mode == "swap" else None
+    ensure_checkpoint_table(cur, f"{sf_database}.{sf_schema}")
+    done = {}
+    if ingest_mode != "typed":
+        done = resume_chunks(cur, f"{sf_database}.{sf_schema}", side_table or table_name,
+                             fname, chunk_size, rows_staged)
+    if done:
+        print(f"↩️ {fname}: {len(done)} chunks ya confirmados, se retoma desde el primero pendiente")
+    else:
+        clear_checkpoints(cur, f"{sf_database}.{sf_schema}", fname)
 
-    # -------- subir al stage --------
-    print(f"Subiendo {fname} al stage…")
-    cur.execute(f"PUT file://{os.path.abspath(local_path)} "
-                f"@{sf_database}.{sf_schema}.{stage_name} OVERWRITE=TRUE")
+    # -------- tabla destino (lateral en publish_mode="swap") --------
+    target_ref = f"{sf_database}.{sf_schema}.{side_table or table_name}"
+    if side_table is not None and not done:
+        create_side_table(cur, f"{sf_database}.{sf_schema}", table_name, side_table)
+
+    # -------- subir al stage (al retomar se reusa el archivo ya subido) --------
+    if not staged and not done:
+        put_file(cur, upload_path, f"{sf_database}.{sf_schema}.{STAGE_NAME}", parts)
+
+    # -------- COPY tipado directo (ingest_mode="typed") --------
+    if ingest_mode == "typed":
+        try:
+            resolved = resolve_columns(pf.schema_arrow, GREEN_BRONZE_SPEC)
+        except SchemaMismatch as e:
+            print(f"⚠️ {fname}: {e}; se usa la ruta VARIANT")
+        else:
+            if side_table is None:
+                with span("delete"):
+                    cur.execute(f"DELETE FROM {sf_database}.{sf_schema}.{table_name} WHERE SOURCE_FILE = %s", (fname,))
+            run_id = f"{service}_{year}{month:02d}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_typed"
+            try:
+                total_inserted = typed_copy(cur, target_ref,
+                                            f"{sf_database}.{sf_schema}.{STAGE_NAME}", fname, resolved, parts)
+            except Exception as e:
+                audit.add(run_id, service, year, month, fname, 1, rows_in_file,
+                          rows_in_file, 0, 'ERROR', str(e))
+                audit.flush()
+                raise
+            audit.add(run_id, service, year, month, fname, 1, rows_in_file,
+                      rows_in_file, total_inserted, 'OK', None)
+            if side_table is not None:
+                publish_month(cur, f"{sf_database}.{sf_schema}", table_name, side_table, fname)
+            record_fingerprint(cur, f"{sf_database}.{sf_schema}", table_name, fname, service,
+                               remote_fp or remote_fingerprint(url), local_fingerprint(local_path))
+            if build_silver:
+                build_silver_month(cur, sf_database, sf_schema, service, fname)
+            audit.close()
+            cur.close(); release_connection(conn)
+            print(f"✅ {year}-{month:02d} cargado (COPY tipado): {total_inserted}/{rows_in_file}")
+            return {"file": fname, "year": year, "month": month, "chunk_size": chunk_size,
+                    "rows_in_file": rows_in_file, "rows_inserted": total_inserted, "ingest_mode": "typed"}
 
     # -------- staging temporal --------
     print("Creando tabla temporal staging …")
-    cur.execute(f"CREATE OR REPLACE TEMP TABLE {tmp_table} (V VARIANT)")
-
-    print("COPY INTO staging VARIANT …")
-    cur.execute(f"""
-        COPY INTO {tmp_table}(V)
-        FROM @{sf_database}.{sf_schema}.{stage_name}/{fname}
-        FILE_FORMAT = (TYPE=PARQUET)
-        ON_ERROR = ABORT_STATEMENT
-    """)
+    loaded = copy_to_chunked_staging(cur, tmp_table, f"{sf_database}.{sf_schema}.{STAGE_NAME}", fname, chunk_size, parts,
+                                     shared=max_in_flight > 1)
+    if done and loaded != rows_staged:
+        # el stage ya no tiene el archivo de la corrida anterior: se vuelve a subir
+        put_file(cur, upload_path, f"{sf_database}.{sf_schema}.{STAGE_NAME}", parts)
+        copy_to_chunked_staging(cur, tmp_table, f"{sf_database}.{sf_schema}.{STAGE_NAME}", fname, chunk_size, parts,
+                                shared=max_in_flight > 1)
 
     # -------- idempotencia --------
     print("Eliminando datos previos de", fname)
-    cur.execute(f"DELETE FROM {sf_database}.{sf_schema}.{table_name} WHERE SOURCE_FILE = %s", (fname,))
+    if side_table is None and not done:
+        with span("delete"):
+            cur.execute(f"DELETE FROM {sf_database}.{sf_schema}.{table_name} WHERE SOURCE_FILE = %s", (fname,))
 
     # -------- chunking con reintentos --------
-    total_inserted = 0
-    n_chunks = (rows_in_file + chunk_size - 1) // chunk_size
+    n_chunks = (rows_staged + chunk_size - 1) // chunk_size
     run_id_base = f"{service}_{year}{month:02d}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+    inserted = dict(done)  # filas por chunk confirmado
 
-    for chunk_index in range(1, n_chunks + 1):
+    def insert_chunk(chunk_cur, chunk_index):
         start_rn = (chunk_index - 1) * chunk_size + 1
-        end_rn   = min(chunk_index * chunk_size, rows_in_file)
-        run_id   = f"{run_id_base}_c{chunk_index}"
+        end_rn   = min(chunk_index * chunk_size, rows_staged)
         print(f"Chunk {chunk_index}/{n_chunks}: rn {start_rn}-{end_rn}")
 
         insert_sql = f"""
-        INSERT INTO {sf_database}.{sf_schema}.{table_name}
+        INSERT INTO {target_ref}
         (VENDORID, LPEP_PICKUP_DATETIME, LPEP_DROPOFF_DATETIME, STORE_AND_FWD_FLAG,
          RATECODEID, PULOCATIONID, DOLOCATIONID, PASSENGER_COUNT, TRIP_DISTANCE,
          FARE_AMOUNT, EXTRA, MTA_TAX, TIP_AMOUNT, TOLLS_AMOUNT, EHAIL_FEE,
@@ -137,46 +203,47 @@ def load_green_month_chunked(*, year:int, month:int, chunk_size:int=1_000_000, m
             TRY_TO_DECIMAL(v:congestion_surcharge::string, 12, 2),
             TRY_TO_DECIMAL(v:cbd_congestion_fee::string, 12, 2),
             '{fname}'
-        FROM (
-            SELECT V, ROW_NUMBER() OVER (ORDER BY V:lpep_pickup_datetime::string) AS rn
-            FROM {tmp_table}
-        )
-        WHERE rn BETWEEN {start_rn} AND {end_rn}
+        FROM {tmp_table}
+        WHERE CHUNK_ID = {chunk_index}
         """
 
-        attempt = 0
-        success = False
-        while attempt < max_retries and not success:
-            try:
-                cur.execute(insert_sql)
-                inserted_chunk = cur.rowcount
-                total_inserted += inserted_chunk
-
-                cur.execute(f"""
-                    INSERT INTO {sf_database}.{sf_schema}.{meta_table}
-                    (RUN_ID,SERVICE,YEAR,MONTH,SOURCE_FILE,CHUNK_INDEX,CHUNK_SIZE,
-                     ROWS_IN_FILE,ROWS_INSERTED,STATUS,ERROR_MESSAGE,INGEST_TS)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP())
-                """, (run_id, service, year, month, fname, chunk_index, chunk_size,
-                      rows_in_file, inserted_chunk, 'OK', None))
-                success = True
-            except Exception as e:
-                attempt += 1
-                if attempt >= max_retries:
-                    cur.execute(f"""
-                        INSERT INTO {sf_database}.{sf_schema}.{meta_table}
-                        (RUN_ID,SERVICE,YEAR,MONTH,SOURCE_FILE,CHUNK_INDEX,CHUNK_SIZE,
-                         ROWS_IN_FILE,ROWS_INSERTED,STATUS,ERROR_MESSAGE,INGEST_TS)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP())
-                    """, (run_id, service, year, month, fname, chunk_index, chunk_size,
-                          rows_in_file, 0, 'ERROR', str(e)))
-                    raise
-                else:
-                    print(f"⚠️ Error en chunk {chunk_index} intento {attempt}: {e}, reintentando…")
-                    time.sleep(5)
+        def attempt_insert(attempt):
+            with span("chunk_insert", chunk=chunk_index, attempt=attempt) as sp:
+                sp["rows"] = commit_chunk(chunk_cur, f"{sf_database}.{sf_schema}", side_table or table_name, fname,
+                                          chunk_size, rows_staged, chunk_index, insert_sql, recheck=attempt > 1)
+            return sp
+
+        return run_with_retries(attempt_insert, retries=max_retries, label=f"chunk {chunk_index}")
+
+    def chunk_done(chunk_index, sp, error):
+        # una fila de auditoría por chunk, con su resultado final (hilo principal)
+        run_id = f"{run_id_base}_c{chunk_index}"
+        if error is not None:
+            audit.add(run_id, service, year, month, fname, chunk_index, chunk_size,
+                      rows_in_file, 0, 'ERROR', str(error))
+            audit.flush()
+            return
+        inserted[chunk_index] = sp["rows"]
+        audit.add(run_id, service, year, month, fname, chunk_index, chunk_size,
+                  rows_in_file, sp["rows"], 'OK', None, metrics=sp)
+
+    pending = [i for i in range(1, n_chunks + 1) if i not in done]
+    try:
+        run_chunks(cur, pending, insert_chunk, chunk_done, max_in_flight=max_in_flight, schema=sf_schema)
+    finally:
+        drop_staging(cur, tmp_table)
+    total_inserted = sum(inserted.values())
 
+    if side_table is not None:
+        publish_month(cur, f"{sf_database}.{sf_schema}", table_name, side_table, fname)
+    clear_checkpoints(cur, f"{sf_database}.{sf_schema}", fname)
+    record_fingerprint(cur, f"{sf_database}.{sf_schema}", table_name, fname, service,
+                       remote_fp or remote_fingerprint(url), local_fingerprint(local_path))
+    if build_silver:
+        build_silver_month(cur, sf_database, sf_schema, service, fname)
+    audit.close()
     cur.close()
-    conn.close()
+    release_connection(conn)
 
     print(f"✅ {year}-{month:02d} cargado: {total_inserted}/{rows_in_file}")
     return {
@@ -189,36 +256,95 @@ def load_green_month_chunked(*, year:int, month:int, chunk_size:int=1_000_000, m
     }
 
 
+def download_green_month(*, year:int, month:int, preprocess:bool=False, force:bool=False):
+    """
+    Etapa de descarga del modo pipeline. Devuelve False si el mes no existe (404)
+    o no cambió desde la última carga (el loader lo registra como SKIPPED).
+    """
+    os.makedirs(DEST_DIR, exist_ok=True)
+    fname = f"green_tripdata_{year}-{month:02d}.parquet"
+    set_tags(service="green", year=year, month=month, file=fname)
+    local_path = os.path.join(DEST_DIR, fname)
+    remote_fp = None
+    if not force:
+        unchanged, remote_fp = source_unchanged(f"{BASE_URL}/{fname}", fname, "GREEN_TRIPS", default_schema="RAW")
+        if unchanged:
+            return False
+    try:
+        ensure_local_file(f"{BASE_URL}/{fname}", local_path, remote=remote_fp)
+    except SourceNotFound:
+        return False
+    if preprocess:
+        prepare_for_upload(local_path, "green")
+    return True
+
+
+def put_green_month(*, year:int, month:int, preprocess:bool=False, upload_mode:str="single"):
+    """
+    Etapa de subida del modo pipeline: PUT del archivo ya descargado al stage.
+    """
+    fname = f"green_tripdata_{year}-{month:02d}.parquet"
+    set_tags(service="green", year=year, month=month, file=fname)
+    conn, sf_database, sf_schema = acquire_connection(default_schema="RAW")
+    cur = conn.cursor()
+    try:
+        create_parquet_stage(cur, f"{sf_database}.{sf_schema}", STAGE_NAME)
+        local_path = os.path.join(DEST_DIR, fname)
+        if preprocess:
+            local_path, _ = prepare_for_upload(local_path, "green")
+        parts = split_parquet(local_path) if upload_mode == "parts" else None
+        put_file(cur, local_path, f"{sf_database}.{sf_schema}.{STAGE_NAME}", parts)
+    finally:
+        cur.close()
+        release_connection(conn)
+
+
 @data_loader
 def backfill_green_all_months(*args, **kwargs):
     """
     Backfill completo de Green Taxi 2015-01 a 2025-12.
     Idempotente y con reintentos en cada chunk.
+    max_workers (variable del pipeline) controla cuántos meses corren a la vez;
+    pipelined=True solapa descarga/PUT del mes siguiente con COPY/INSERT del actual.
+    publish_mode='swap' arma el mes en una tabla lateral y lo publica en una transacción.
+    build_silver=True deriva SILVER.TAXI_TRIPS_ALL desde bronze apenas termina cada mes.
+    audit_metrics=True agrega ELAPSED_SEC / ROWS_PER_SEC de cada chunk a la auditoría.
+    force=True recarga aunque la huella de la fuente no haya cambiado.
+    preprocess=True normaliza/castea el Parquet localmente con pyarrow antes del PUT.
+    ingest_mode='typed' usa el COPY tipado directo (fallback VARIANT por archivo).
+    upload_mode='parts' parte cada archivo por row groups, con PUT en paralelo y un solo COPY.
+    max_in_flight=N inserta hasta N chunks de un mes a la vez, cada uno en su sesión
+    (sesiones abiertas: hasta max_workers * max_in_flight).
+    Devuelve un resumen; el resultado de cada mes queda en data/run_results/ (Parquet).
     """
-    start_year, start_month = 2015, 1
-    end_year, end_month = 2025, 12
-
-    months = []
-    y, m = start_year, start_month
-    while (y < end_year) or (y == end_year and m <= end_month):
-        months.append((y, m))
-        if m == 12:
-            y += 1
-            m = 1
-        else:
-            m += 1
+    months = month_range(2015, 1, 2025, 12)
+    max_workers = int(kwargs.get('max_workers', 4))
+    preprocess = parse_flag(kwargs.get('preprocess', False))
+    force = parse_flag(kwargs.get('force', False))
+    publish_mode = kwargs.get('publish_mode', 'delete')
+    upload_mode = kwargs.get('upload_mode', 'single')
+    max_in_flight = int(kwargs.get('max_in_flight', 1))
+    build_silver = parse_flag(kwargs.get('build_silver', False))
+    audit_metrics = parse_flag(kwargs.get('audit_metrics', False))
+    ingest_mode = kwargs.get('ingest_mode', 'variant')
 
-    results = []
-    for (y, m) in months:
-        print(f"\n=== Procesando {y}-{m:02d} ===")
-        try:
-            res = load_green_month_chunked(year=y, month=m, chunk_size=1_000_000, max_retries=3)
-            results.append({"year": y, "month": m, "status": "OK",
-                            "rows_inserted": res.get("rows_inserted"),
-                            "rows_in_file": res.get("rows_in_file")})
-        except Exception as e:
-            print(f"⚠️ Error en {y}-{m:02d}: {e}")
-            results.append({"year": y, "month": m, "status": "ERROR", "error": str(e)})
+    with collect_spans() as spans:
+        if parse_flag(kwargs.get('pipelined', False)):
+            results = run_months_pipelined(load_green_month_chunked, months,
+                                           download_fn=partial(download_green_month, preprocess=preprocess, force=force),
+                                           upload_fn=partial(put_green_month, preprocess=preprocess, upload_mode=upload_mode),
+                                           queue_size=int(kwargs.get('queue_size', 2)),
+                                           chunk_size=1_000_000, max_retries=3, ingest_mode=ingest_mode,
+                                           preprocess=preprocess, force=force, publish_mode=publish_mode, upload_mode=upload_mode,
+                                           max_in_flight=max_in_flight,
+                                           build_silver=build_silver, audit_metrics=audit_metrics)
+        else:
+            results = run_months(load_green_month_chunked, months, max_workers=max_workers,
+                                 chunk_size=1_000_000, max_retries=3, ingest_mode=ingest_mode,
+                                 preprocess=preprocess, force=force, publish_mode=publish_mode, upload_mode=upload_mode,
+                                 max_in_flight=max_in_flight,
+                                 build_silver=build_silver, audit_metrics=audit_metrics)
 
+    close_all()
     print("\n✅ Backfill terminado")
-    return results
+    return save_run_results('ingest_green_taxi', results, spans)
@@ -1,7 +1,6 @@
-import io
 import pandas as pd
-import requests
 from pandas import DataFrame
+from utils.downloads import ensure_local_file
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
@@ -13,10 +12,13 @@ if 'test' not in globals():
 def load_data_from_api(**kwargs) -> DataFrame:
     """
     Template for loading data from API
+    (el CSV queda en la caché de fuentes, data/titanic.csv)
     """
     url = 'https://raw.githubusercontent.com/datasciencedojo/datasets/master/titanic.csv?raw=True'
+    local_path = 'data/titanic.csv'
+    ensure_local_file(url, local_path, validate=None, retries=5, delay=5, timeout=120)
 
-    return pd.read_csv(url)
+    return pd.read_csv(local_path)
 
 
 @test
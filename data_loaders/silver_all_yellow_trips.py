@@ -1,109 +1,159 @@
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
 
-import os, time, requests
+import os
 import pyarrow.parquet as pq
-import snowflake.connector
-from mage_ai.data_preparation.shared.secrets import get_secret_value
+from functools import partial
+from utils.arrow_prep import prepare_for_upload
+from utils.backfill import month_range, run_months, run_months_pipelined, tmp_table_name
+from utils.checkpoints import clear_checkpoints, commit_chunk, ensure_checkpoint_table
+from utils.chunk_runner import run_chunks
+from utils.downloads import SourceNotFound, ensure_local_file
+from utils.fingerprints import (check_unchanged, invalidate_fingerprint, local_fingerprint,
+                                remote_fingerprint, record_fingerprint, source_unchanged)
+from utils.flags import parse_flag
+from utils.metrics import collect_spans, set_tags, span
+from utils.publish import create_side_table, publish_month, side_table_name
+from utils.retry import run_with_retries
+from utils.run_results import save_run_results
+from utils.silver_build import build_silver_from_bronze
+from utils.taxi_zones import ZONE_COLUMNS, ZONE_EXPRS, ZONES_TABLE, ensure_zone_columns, ensure_zones_table, zone_joins
+from utils.warehouse import acquire_connection, close_all, release_connection
+from utils.staging import copy_to_chunked_staging, create_parquet_stage, drop_staging, put_file, split_parquet
 
 BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data"
+DEST_DIR = "data/nyc_tlc"
+STAGE_NAME = "TAXI_STAGE"
 
-def need(name, val):
-    if not val:
-        raise Exception(f"Falta el secret '{name}' en Mage (Settings → Secrets).")
-    return val
-
-def load_yellow_to_silver(*, year:int, month:int, chunk_size:int=1_000_000, max_retries:int=3):
+def load_yellow_to_silver(*, year:int, month:int, chunk_size:int=1_000_000, max_retries:int=3,
+                          tmp_table:str=None, staged:bool=False, preprocess:bool=False, force:bool=False,
+                          publish_mode:str="delete", source:str="file", upload_mode:str="single",
+                          max_in_flight:int=1):
     """
     Carga un mes de Yellow Taxi a SILVER.TAXI_TRIPS_ALL con limpieza y estandarización.
+    Con source="bronze" el mes se deriva de bronze dentro del warehouse (sin
+    descargar ni subir el archivo otra vez).
+    Cada chunk se confirma con su checkpoint en SILVER.LOAD_CHECKPOINTS: un
+    reintento nunca vuelve a insertar un chunk ya confirmado.
     """
     service    = "yellow"
-    dest_dir   = "data/nyc_tlc"
-    stage_name = "TAXI_STAGE"
-    tmp_table  = "_TMP_RAW_VARIANT"
+    if source == "bronze":
+        return build_silver_from_bronze(year=year, month=month, service=service,
+                                        bronze_default_schema="BRONZE")
+
+    tmp_table  = tmp_table or tmp_table_name(service, year, month)
 
-    os.makedirs(dest_dir, exist_ok=True)
+    os.makedirs(DEST_DIR, exist_ok=True)
     fname = f"{service}_tripdata_{year}-{month:02d}.parquet"
     url = f"{BASE_URL}/{fname}"
-    local_path = os.path.join(dest_dir, fname)
-
-    # --- credenciales ---
-    sf_user      = need("SNOWFLAKE_USER",      get_secret_value("SNOWFLAKE_USER"))
-    sf_password  = need("SNOWFLAKE_PASSWORD",  get_secret_value("SNOWFLAKE_PASSWORD"))
-    sf_account   = need("SNOWFLAKE_ACCOUNT",   get_secret_value("SNOWFLAKE_ACCOUNT"))
-    sf_warehouse = get_secret_value("SNOWFLAKE_WAREHOUSE") or "WH_INGEST"
-    sf_database  = get_secret_value("SNOWFLAKE_DATABASE")  or "NYC_TAXI"
-
-    conn = snowflake.connector.connect(
-        user=sf_user,
-        password=sf_password,
-        account=sf_account,
-        role="SYSADMIN",
-        warehouse=sf_warehouse,
-        database=sf_database,
-        schema="SILVER",
-        insecure_mode = True
-    )
+    local_path = os.path.join(DEST_DIR, fname)
+    set_tags(service=service, year=year, month=month, file=fname)
+
+    conn, sf_database, sf_schema = acquire_connection(schema="SILVER")
     cur = conn.cursor()
 
     # --- objetos base ---
-    cur.execute(f"CREATE FILE FORMAT IF NOT EXISTS {sf_database}.SILVER.PARQUET_FORMAT TYPE=PARQUET")
-    cur.execute(f"CREATE STAGE IF NOT EXISTS {sf_database}.SILVER.{stage_name} "
-                f"FILE_FORMAT={sf_database}.SILVER.PARQUET_FORMAT")
+    create_parquet_stage(cur, f"{sf_database}.SILVER", STAGE_NAME)
+    ensure_zone_columns(cur, f"{sf_database}.SILVER.TAXI_TRIPS_ALL")
+
+    # --- detección de cambios en la fuente ---
+    remote_fp = None
+    if not force:
+        unchanged, remote_fp, stored_fp = check_unchanged(cur, f"{sf_database}.SILVER", "TAXI_TRIPS_ALL", fname, url)
+        if unchanged:
+            cur.close(); release_connection(conn)
+            print(f"⏭️ {fname} sin cambios desde la última carga OK, se omite (force=True para recargar)")
+            return {"file": fname, "year": year, "month": month, "status": "SKIPPED",
+                    "rows_in_file": stored_fp["rows_in_file"], "rows_inserted": 0}
 
     # --- descarga parquet ---
-    if not os.path.exists(local_path):
-        print(f"Descargando {url} …")
-        r = requests.get(url, timeout=180)
-        if r.status_code == 404:
+    if not staged:
+        try:
+            ensure_local_file(url, local_path, remote=remote_fp)
+        except SourceNotFound:
             print(f"⚠️ Archivo no encontrado: {url}")
+            cur.close(); release_connection(conn)
             return {"file": fname, "status": "MISSING"}
-        r.raise_for_status()
-        with open(local_path, 'wb') as f:
-            f.write(r.content)
 
-    pf = pq.ParquetFile(local_path)
-    rows_in_file = pf.metadata.num_rows
+    with span("parquet_open", bytes=os.path.getsize(local_path)) as sp:
+        pf = pq.ParquetFile(local_path)
+        sp["rows"] = rows_in_file = pf.metadata.num_rows
     print(f"Archivo {fname} con {rows_in_file} filas")
+    rows_staged = rows_in_file
+
+    # --- preprocesamiento local (opcional) ---
+    upload_path = local_path
+    if preprocess:
+        upload_path, rows_staged = prepare_for_upload(local_path, service, apply_quality=True)
+
+    # -------- partes por row group (upload_mode="parts") --------
+    parts = split_parquet(upload_path) if upload_mode == "parts" else None
+
+    # la huella anterior deja de valer antes de tocar los datos del mes
+    invalidate_fingerprint(cur, f"{sf_database}.SILVER", "TAXI_TRIPS_ALL", fname)
+
+    # --- tabla destino (lateral en publish_mode="swap") ---
+    target_ref = f"{sf_database}.SILVER.TAXI_TRIPS_ALL"
+    side_table = None
+    if publish_mode == "swap":
+        side_table = side_table_name("TAXI_TRIPS_ALL", year, month, service)
+        create_side_table(cur, f"{sf_database}.SILVER", "TAXI_TRIPS_ALL", side_table)
+        target_ref = f"{sf_database}.SILVER.{side_table}"
 
     # --- subir al stage ---
-    cur.execute(f"PUT file://{os.path.abspath(local_path)} "
-                f"@{sf_database}.SILVER.{stage_name} OVERWRITE=TRUE")
+    if not staged:
+        put_file(cur, upload_path, f"{sf_database}.SILVER.{STAGE_NAME}", parts)
 
     # --- staging temporal ---
-    cur.execute(f"CREATE OR REPLACE TEMP TABLE {tmp_table} (V VARIANT)")
-    cur.execute(f"""
-        COPY INTO {tmp_table}(V)
-        FROM @{sf_database}.SILVER.{stage_name}/{fname}
-        FILE_FORMAT = (TYPE=PARQUET)
-        ON_ERROR = ABORT_STATEMENT
-    """)
+    copy_to_chunked_staging(cur, tmp_table, f"{sf_database}.SILVER.{STAGE_NAME}", fname, chunk_size, parts,
+                            shared=max_in_flight > 1)
 
     # --- idempotencia ---
-    cur.execute(f"DELETE FROM {sf_database}.SILVER.TAXI_TRIPS_ALL WHERE SOURCE_FILE = %s", (fname,))
+    if side_table is None:
+        with span("delete"):
+            cur.execute(f"DELETE FROM {sf_database}.SILVER.TAXI_TRIPS_ALL WHERE SOURCE_FILE = %s", (fname,))
 
     # --- chunking ---
-    total_inserted = 0
-    n_chunks = (rows_in_file + chunk_size - 1) // chunk_size
+    n_chunks = (rows_staged + chunk_size - 1) // chunk_size
+    checkpoint_table = side_table or "TAXI_TRIPS_ALL"
+    ensure_checkpoint_table(cur, f"{sf_database}.SILVER")
+    clear_checkpoints(cur, f"{sf_database}.SILVER", fname)
+    inserted = {}  # filas por chunk confirmado
 
-    for chunk_index in range(1, n_chunks + 1):
+    # zonas de pickup / dropoff: ya vienen en el Parquet preparado (preprocess)
+    # o salen del mismo JOIN con SILVER.TAXI_ZONES que usa utils.silver_build
+    if preprocess:
+        zone = {col: f"v:{col.lower()}::string" for col in ZONE_COLUMNS}
+        zone_join = ""
+    else:
+        ensure_zones_table(cur, f"{sf_database}.SILVER")
+        zone = dict(zip(ZONE_COLUMNS, ZONE_EXPRS))
+        zone_join = zone_joins(f"{sf_database}.SILVER.{ZONES_TABLE}", "TRY_TO_NUMBER(v:PULocationID::string)",
+                               "TRY_TO_NUMBER(v:DOLocationID::string)")
+
+    def insert_chunk(chunk_cur, chunk_index):
         start_rn = (chunk_index - 1) * chunk_size + 1
-        end_rn   = min(chunk_index * chunk_size, rows_in_file)
+        end_rn   = min(chunk_index * chunk_size, rows_staged)
         print(f"Chunk {chunk_index}/{n_chunks}: filas {start_rn}-{end_rn}")
 
         insert_sql = f"""
-            INSERT INTO {sf_database}.SILVER.TAXI_TRIPS_ALL
+            INSERT INTO {target_ref}
             (AIRPORT_FEE, CBD_CONGESTION_FEE, CONGESTION_SURCHARGE,
-            DOLOCATION_ID, DROPOFF_DATETIME, EHAIL_FEE, EXTRA, FARE_AMOUNT,
+            DO_BOROUGH, DO_SERVICE_ZONE, DO_ZONE, DOLOCATION_ID, DROPOFF_DATETIME,
+            EHAIL_FEE, EXTRA, FARE_AMOUNT,
             IMPROVEMENT_SURCHARGE, LOAD_TS, MTA_TAX, PASSENGER_COUNT,
-            PAYMENT_TYPE, PAYMENT_TYPE_ID, PICKUP_DATETIME, PULOCATION_ID,
+            PAYMENT_TYPE, PAYMENT_TYPE_ID, PICKUP_DATETIME, PU_BOROUGH,
+            PU_SERVICE_ZONE, PU_ZONE, PULOCATION_ID,
             RATECODE_ID, SERVICE_TYPE, SOURCE_FILE, STORE_AND_FWD_FLAG,
             TIP_AMOUNT, TOLLS_AMOUNT, TOTAL_AMOUNT, TRIP_DISTANCE, TRIP_TYPE,
             VENDOR_ID)
             SELECT
-                TRY_TO_DECIMAL(v:Airport_fee::string, 12, 2)                         AS AIRPORT_FEE,
+                TRY_TO_DECIMAL(COALESCE(v:Airport_fee::string, v:airport_fee::string), 12, 2) AS AIRPORT_FEE,
                 TRY_TO_DECIMAL(v:cbd_congestion_fee::string, 12, 2)                  AS CBD_CONGESTION_FEE,
                 TRY_TO_DECIMAL(v:congestion_surcharge::string, 12, 2)                AS CONGESTION_SURCHARGE,
+                {zone["DO_BOROUGH"]}                                                 AS DO_BOROUGH,
+                {zone["DO_SERVICE_ZONE"]}                                            AS DO_SERVICE_ZONE,
+                {zone["DO_ZONE"]}                                                    AS DO_ZONE,
                 TRY_TO_NUMBER(v:DOLocationID::string)                                AS DOLOCATION_ID,
                 TO_TIMESTAMP_NTZ(v:tpep_dropoff_datetime::string)                    AS DROPOFF_DATETIME,
                 NULL                                                                 AS EHAIL_FEE,
@@ -124,6 +174,9 @@ def load_yellow_to_silver(*, year:int, month:int, chunk_size:int=1_000_000, max_
                 END                                                                  AS PAYMENT_TYPE,
                 TRY_TO_NUMBER(v:payment_type::string)                                AS PAYMENT_TYPE_ID,
                 TO_TIMESTAMP_NTZ(v:tpep_pickup_datetime::string)                     AS PICKUP_DATETIME,
+                {zone["PU_BOROUGH"]}                                                 AS PU_BOROUGH,
+                {zone["PU_SERVICE_ZONE"]}                                            AS PU_SERVICE_ZONE,
+                {zone["PU_ZONE"]}                                                    AS PU_ZONE,
                 TRY_TO_NUMBER(v:PULocationID::string)                                AS PULOCATION_ID,
                 TRY_TO_NUMBER(v:RatecodeID::string)                                  AS RATECODE_ID,
                 'yellow'                                                             AS SERVICE_TYPE,
@@ -135,11 +188,9 @@ def load_yellow_to_silver(*, year:int, month:int, chunk_size:int=1_000_000, max_
                 TRY_TO_DECIMAL(v:trip_distance::string, 12, 3)                       AS TRIP_DISTANCE,
                 TRY_TO_NUMBER(v:trip_type::string)                                   AS TRIP_TYPE,
                 TRY_TO_NUMBER(v:VendorID::string)                                    AS VENDOR_ID
-            FROM (
-                SELECT V, ROW_NUMBER() OVER (ORDER BY V:tpep_pickup_datetime::string) AS rn
-                FROM {tmp_table}
-            )
-            WHERE rn BETWEEN {start_rn} AND {end_rn}
+            FROM {tmp_table}
+            {zone_join}
+            WHERE CHUNK_ID = {chunk_index}
             -- Reglas de calidad mínimas:
             AND v:tpep_pickup_datetime IS NOT NULL
             AND v:tpep_dropoff_datetime IS NOT NULL
@@ -149,47 +200,120 @@ def load_yellow_to_silver(*, year:int, month:int, chunk_size:int=1_000_000, max_
                                 TO_TIMESTAMP_NTZ(v:tpep_dropoff_datetime::string)) <= 24
             """
 
+        def attempt_insert(attempt):
+            with span("chunk_insert", chunk=chunk_index, attempt=attempt) as sp:
+                sp["rows"] = commit_chunk(chunk_cur, f"{sf_database}.SILVER", checkpoint_table, fname,
+                                          chunk_size, rows_staged, chunk_index, insert_sql, recheck=attempt > 1)
+            return sp
+
+        return run_with_retries(attempt_insert, retries=max_retries, label=f"chunk {chunk_index}")
+
+    def chunk_done(chunk_index, sp, error):
+        if error is None:
+            inserted[chunk_index] = sp["rows"]
 
-        attempt = 0
-        while attempt < max_retries:
-            try:
-                cur.execute(insert_sql)
-                total_inserted += cur.rowcount
-                break
-            except Exception as e:
-                attempt += 1
-                if attempt == max_retries:
-                    print(f"❌ Error definitivo en chunk {chunk_index}: {e}")
-                    raise
-                else:
-                    print(f"⚠️ Error en chunk {chunk_index} intento {attempt}: {e}, reintentando…")
-                    time.sleep(5)
+    try:
+        run_chunks(cur, range(1, n_chunks + 1), insert_chunk, chunk_done, max_in_flight=max_in_flight, schema="SILVER")
+    finally:
+        drop_staging(cur, tmp_table)
+    total_inserted = sum(inserted.values())
 
+    if side_table is not None:
+        publish_month(cur, f"{sf_database}.SILVER", "TAXI_TRIPS_ALL", side_table, fname)
+    clear_checkpoints(cur, f"{sf_database}.SILVER", fname)
+    record_fingerprint(cur, f"{sf_database}.SILVER", "TAXI_TRIPS_ALL", fname, service,
+                       remote_fp or remote_fingerprint(url), local_fingerprint(local_path))
     cur.close()
-    conn.close()
+    release_connection(conn)
     print(f"✅ {year}-{month:02d}: {total_inserted}/{rows_in_file} filas insertadas")
     return {"file": fname, "rows_inserted": total_inserted, "rows_in_file": rows_in_file}
 
+def download_yellow_silver_month(*, year:int, month:int, preprocess:bool=False, force:bool=False):
+    """
+    Etapa de descarga del modo pipeline. Devuelve False si el mes no existe (404)
+    o no cambió desde la última carga (el loader lo registra como SKIPPED).
+    """
+    os.makedirs(DEST_DIR, exist_ok=True)
+    fname = f"yellow_tripdata_{year}-{month:02d}.parquet"
+    set_tags(service="yellow", year=year, month=month, file=fname)
+    local_path = os.path.join(DEST_DIR, fname)
+    remote_fp = None
+    if not force:
+        unchanged, remote_fp = source_unchanged(f"{BASE_URL}/{fname}", fname, "TAXI_TRIPS_ALL", schema="SILVER")
+        if unchanged:
+            return False
+    try:
+        ensure_local_file(f"{BASE_URL}/{fname}", local_path, remote=remote_fp)
+    except SourceNotFound:
+        return False
+    if preprocess:
+        prepare_for_upload(local_path, "yellow", apply_quality=True)
+    return True
+
+
+def put_yellow_silver_month(*, year:int, month:int, preprocess:bool=False, upload_mode:str="single"):
+    """
+    Etapa de subida del modo pipeline: PUT del archivo ya descargado al stage.
+    """
+    fname = f"yellow_tripdata_{year}-{month:02d}.parquet"
+    set_tags(service="yellow", year=year, month=month, file=fname)
+    conn, sf_database, sf_schema = acquire_connection(schema="SILVER")
+    cur = conn.cursor()
+    try:
+        create_parquet_stage(cur, f"{sf_database}.SILVER", STAGE_NAME)
+        local_path = os.path.join(DEST_DIR, fname)
+        if preprocess:
+            local_path, _ = prepare_for_upload(local_path, "yellow", apply_quality=True)
+        parts = split_parquet(local_path) if upload_mode == "parts" else None
+        put_file(cur, local_path, f"{sf_database}.SILVER.{STAGE_NAME}", parts)
+    finally:
+        cur.close()
+        release_connection(conn)
+
+
+def _month_result(y, m, res):
+    return {"year": y, "month": m, "status": "OK", **res}
+
+
 @data_loader
 def backfill_yellow_silver_all_months(*args, **kwargs):
     """
     Backfill completo Yellow Taxi → SILVER.TAXI_TRIPS_ALL (2015-01 → 2025-12)
+    max_workers (variable del pipeline) controla cuántos meses corren a la vez;
+    pipelined=True solapa descarga/PUT del mes siguiente con COPY/INSERT del actual.
+    publish_mode='swap' arma el mes en una tabla lateral y lo publica en una transacción.
+    source='bronze' deriva cada mes desde la tabla bronze en vez de re-ingerir el archivo.
+    force=True recarga aunque la huella de la fuente no haya cambiado.
+    preprocess=True normaliza/castea/filtra el Parquet localmente con pyarrow antes del PUT
+    y agrega borough / zone / service_zone de pickup y dropoff (lookup de taxi zones).
+    upload_mode='parts' parte cada archivo por row groups, con PUT en paralelo y un solo COPY.
+    max_in_flight=N inserta hasta N chunks de un mes a la vez, cada uno en su sesión
+    (sesiones abiertas: hasta max_workers * max_in_flight).
+    Devuelve un resumen; el resultado de cada mes queda en data/run_results/ (Parquet).
     """
-    start_year, start_month = 2015, 1
-    end_year, end_month = 2025, 12
-    y, m = start_year, start_month
-    results = []
+    months = month_range(2015, 1, 2025, 12)
+    max_workers = int(kwargs.get('max_workers', 4))
+    preprocess = parse_flag(kwargs.get('preprocess', False))
+    force = parse_flag(kwargs.get('force', False))
+    publish_mode = kwargs.get('publish_mode', 'delete')
+    upload_mode = kwargs.get('upload_mode', 'single')
+    max_in_flight = int(kwargs.get('max_in_flight', 1))
+    source = kwargs.get('source', 'file')
 
-    while (y < end_year) or (y == end_year and m <= end_month):
-        print(f"\n=== Procesando {y}-{m:02d} ===")
-        try:
-            res = load_yellow_to_silver(year=y, month=m)
-            results.append({"year": y, "month": m, "status": "OK", **res})
-        except Exception as e:
-            results.append({"year": y, "month": m, "status": "ERROR", "error": str(e)})
-        if m == 12:
-            y += 1; m = 1
+    with collect_spans() as spans:
+        if parse_flag(kwargs.get('pipelined', False)) and source == 'file':
+            results = run_months_pipelined(load_yellow_to_silver, months,
+                                           download_fn=partial(download_yellow_silver_month, preprocess=preprocess, force=force),
+                                           upload_fn=partial(put_yellow_silver_month, preprocess=preprocess, upload_mode=upload_mode),
+                                           queue_size=int(kwargs.get('queue_size', 2)),
+                                           result_fn=_month_result,
+                                           preprocess=preprocess, force=force, publish_mode=publish_mode, upload_mode=upload_mode,
+                                           max_in_flight=max_in_flight, source=source)
         else:
-            m += 1
+            results = run_months(load_yellow_to_silver, months, max_workers=max_workers,
+                                 result_fn=_month_result,
+                                 preprocess=preprocess, force=force, publish_mode=publish_mode, upload_mode=upload_mode,
+                                 max_in_flight=max_in_flight, source=source)
+    close_all()
     print("\n✅ Backfill terminado")
-    return results
+    return save_run_results('silver_all_yellow_trips', results, spans)
@@ -2,40 +2,16 @@ if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
 
 import os
-import requests
-import csv
-import snowflake.connector
 import time
-from mage_ai.data_preparation.shared.secrets import get_secret_value
+from utils.downloads import ensure_local_file
+from utils.snowflake_pool import bootstrap_once
+from utils.taxi_zones import LOCAL_CSV, TAXI_ZONES_URL, ZONES_TABLE, ensure_zones_table, get_zone_lookup
+from utils.warehouse import acquire_connection, release_connection
 
-TAXI_ZONES_URL = "https://d37ci6vzurychx.cloudfront.net/misc/taxi_zone_lookup.csv"
-LOCAL_CSV = "data/taxi_zones.csv"
-
-
-def need(name, val):
-    if not val:
-        raise Exception(f"Falta el secret '{name}' en Mage (Settings → Secrets).")
-    return val
+STAGE_NAME = "ZONES_STAGE"
 
 
 # === Funciones de ayuda con reintentos ===
-def retry_request(url, retries=3, delay=5):
-    """
-    Descarga un archivo con reintentos exponenciales.
-    """
-    for i in range(1, retries + 1):
-        try:
-            r = requests.get(url, timeout=120)
-            r.raise_for_status()
-            return r
-        except Exception as e:
-            print(f"⚠️ Error en intento {i}/{retries} al descargar {url}: {e}")
-            if i < retries:
-                time.sleep(delay * i)  # backoff exponencial
-            else:
-                raise
-
-
 def retry_snowflake_op(cur, sql, params=None, retries=3, delay=5):
     """
     Ejecuta una query Snowflake con reintentos si hay error temporal.
@@ -58,88 +34,50 @@ def retry_snowflake_op(cur, sql, params=None, retries=3, delay=5):
 @data_loader
 def load_taxi_zones(*args, **kwargs):
     """
-    Descarga el CSV oficial de taxi zones y lo inserta en BRONZE.TAXI_ZONES.
-    Idempotente + reintentos + inserción en lotes.
+    Descarga el CSV oficial de taxi zones y lo carga en SILVER.TAXI_ZONES con un
+    único COPY INTO desde un stage (sin INSERTs con parámetros).
+    Idempotente: TRUNCATE + COPY van en la misma transacción.
     """
-    # ---------- credenciales ----------
-    sf_user      = need("SNOWFLAKE_USER",      get_secret_value("SNOWFLAKE_USER"))
-    sf_password  = need("SNOWFLAKE_PASSWORD",  get_secret_value("SNOWFLAKE_PASSWORD"))
-    sf_account   = need("SNOWFLAKE_ACCOUNT",   get_secret_value("SNOWFLAKE_ACCOUNT"))
-    sf_warehouse = get_secret_value("SNOWFLAKE_WAREHOUSE") or "WH_INGEST"
-    sf_database  = get_secret_value("SNOWFLAKE_DATABASE")  or "NYC_TAXI"
-    sf_schema    = 'SILVER'
-
-    # ---------- conexión Snowflake ----------
-    conn = snowflake.connector.connect(
-        user=sf_user,
-        password=sf_password,
-        account=sf_account,
-        role="SYSADMIN",
-        warehouse=sf_warehouse,
-        database=sf_database,
-        schema=sf_schema,
-        insecure_mode=True  # quítalo si ya resolviste certificados
-    )
+    # ---------- conexión Snowflake (pool compartido) ----------
+    conn, sf_database, sf_schema = acquire_connection(schema="SILVER")
     cur = conn.cursor()
+    schema_ref = f"{sf_database}.{sf_schema}"
+    stage_ref = f"{schema_ref}.{STAGE_NAME}"
 
     # ---------- descarga del CSV con reintentos ----------
     os.makedirs("data", exist_ok=True)
-    if not os.path.exists(LOCAL_CSV):
-        print(f"Descargando {TAXI_ZONES_URL} …")
-        r = retry_request(TAXI_ZONES_URL, retries=5, delay=5)
-        with open(LOCAL_CSV, "wb") as f:
-            f.write(r.content)
-
-    # ---------- crear tabla si no existe ----------
-    retry_snowflake_op(cur, f"""
-        CREATE TABLE IF NOT EXISTS {sf_database}.{sf_schema}.TAXI_ZONES (
-            LOCATIONID    NUMBER(38,0),
-            BOROUGH       STRING,
-            ZONE          STRING,
-            SERVICE_ZONE  STRING
-        )
-    """)
-
-    # ---------- limpiar tabla para idempotencia ----------
-    retry_snowflake_op(cur, f"TRUNCATE TABLE {sf_database}.{sf_schema}.TAXI_ZONES")
-
-    # ---------- insertar datos en lotes ----------
-    batch_size = 1000  # puedes cambiarlo si quieres
-    batch = []
-    inserted = 0
-
-    with open(LOCAL_CSV, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            batch.append((
-                int(row["LocationID"]) if row.get("LocationID") else None,
-                row.get("Borough"),
-                row.get("Zone"),
-                row.get("service_zone"),
-            ))
-
-            if len(batch) >= batch_size:
-                retry_snowflake_op(
-                    cur,
-                    f"INSERT INTO {sf_database}.{sf_schema}.TAXI_ZONES (LOCATIONID,BOROUGH,ZONE,SERVICE_ZONE) VALUES " +
-                    ", ".join(["(%s,%s,%s,%s)"] * len(batch)),
-                    [val for tup in batch for val in tup]
-                )
-                inserted += len(batch)
-                batch = []
-
-    # Inserta el último batch si quedó algo
-    if batch:
-        retry_snowflake_op(
-            cur,
-            f"INSERT INTO {sf_database}.{sf_schema}.TAXI_ZONES (LOCATIONID,BOROUGH,ZONE,SERVICE_ZONE) VALUES " +
-            ", ".join(["(%s,%s,%s,%s)"] * len(batch)),
-            [val for tup in batch for val in tup]
-        )
-        inserted += len(batch)
-
-    cur.close()
-    conn.close()
-
-    print(f"✅ Cargadas {inserted} filas en {sf_database}.{sf_schema}.TAXI_ZONES (con reintentos y batch insert)")
-    return {"rows_inserted": inserted}
+    ensure_local_file(TAXI_ZONES_URL, LOCAL_CSV, validate=None, retries=5, delay=5, timeout=120)
+    zones = get_zone_lookup(LOCAL_CSV, download=False)
+
+    # ---------- crear tabla y stage si no existen ----------
+    ensure_zones_table(cur, schema_ref)
+    bootstrap_once(cur, stage_ref, f"CREATE STAGE IF NOT EXISTS {stage_ref}")
+
+    # ---------- subir el CSV ----------
+    retry_snowflake_op(cur, f"PUT file://{os.path.abspath(LOCAL_CSV)} @{stage_ref} OVERWRITE=TRUE AUTO_COMPRESS=FALSE")
+
+    # ---------- reemplazo completo de la tabla ----------
+    # FORCE=TRUE: el archivo tiene siempre el mismo nombre y COPY lo saltearía
+    # por la metadata de carga.
+    cur.execute("BEGIN")
+    try:
+        cur.execute(f"TRUNCATE TABLE {schema_ref}.{ZONES_TABLE}")
+        cur.execute(f"""
+            COPY INTO {schema_ref}.{ZONES_TABLE} (LOCATIONID, BOROUGH, ZONE, SERVICE_ZONE)
+            FROM @{stage_ref}/{os.path.basename(LOCAL_CSV)}
+            FILE_FORMAT = (TYPE=CSV SKIP_HEADER=1 FIELD_OPTIONALLY_ENCLOSED_BY='"')
+            FORCE = TRUE
+            ON_ERROR = ABORT_STATEMENT
+        """)
+        # resultado del COPY: (file, status, rows_parsed, rows_loaded, ...)
+        inserted = sum(int(row[3] or 0) for row in cur.fetchall())
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    print(f"✅ Cargadas {inserted} filas en {schema_ref}.{ZONES_TABLE} (taxi zones v{zones.version})")
+    return {"rows_inserted": inserted, "zones_version": zones.version}
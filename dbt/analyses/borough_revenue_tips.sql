@@ -0,0 +1,11 @@
+-- 2) ingresos, propinas y % de propina por borough y mes
+select
+    trip_month,
+    borough,
+    sum(total_revenue)                                   as total_revenue,
+    sum(total_tips)                                      as total_tips,
+    sum(total_tips) / nullif(sum(total_revenue), 0) * 100 as tip_percent
+from {{ ref('agg_borough_revenue_monthly') }}
+where trip_month between '{{ var("start_month", "2015-01-01") }}' and '{{ var("end_month", "2099-12-01") }}'
+group by 1, 2
+order by trip_month, total_revenue desc
@@ -0,0 +1,19 @@
+-- 4) p50 / p90 de duración (minutos) por zona de origen en el rango de meses,
+--    combinando los sketches mensuales en vez de escanear los viajes
+with merged as (
+    select
+        pickup_location_id,
+        sum(trips)                                    as trips,
+        approx_percentile_combine(duration_sketch)    as duration_sketch
+    from {{ ref('agg_duration_sketch_monthly') }}
+    where trip_month between '{{ var("start_month", "2015-01-01") }}' and '{{ var("end_month", "2099-12-01") }}'
+    group by 1
+)
+
+select
+    pickup_location_id,
+    trips,
+    approx_percentile_estimate(duration_sketch, 0.5) as p50_min,
+    approx_percentile_estimate(duration_sketch, 0.9) as p90_min
+from merged
+order by pickup_location_id
@@ -0,0 +1,9 @@
+-- 3) velocidad promedio por borough y franja horaria en el rango de meses
+select
+    borough,
+    daypart,
+    sum(sum_mph) / nullif(sum(trips), 0) as avg_mph
+from {{ ref('agg_speed_daypart_monthly') }}
+where trip_month between '{{ var("start_month", "2015-01-01") }}' and '{{ var("end_month", "2099-12-01") }}'
+group by 1, 2
+order by borough, daypart
@@ -0,0 +1,8 @@
+-- 1) top 10 de zonas por mes, como origen y como destino
+--    dbt compile --vars '{start_month: 2024-01-01, end_month: 2024-12-01}'
+select trip_month, direction, location_id, sum(trips) as trips
+from {{ ref('agg_zone_demand_monthly') }}
+where trip_month between '{{ var("start_month", "2015-01-01") }}' and '{{ var("end_month", "2099-12-01") }}'
+group by 1, 2, 3
+qualify row_number() over (partition by trip_month, direction order by sum(trips) desc) <= 10
+order by trip_month, direction, trips desc
@@ -0,0 +1,50 @@
+{#
+    Modelos incrementales por archivo fuente (un SOURCE_FILE = un mes de un servicio).
+
+    La señal de "mes nuevo" es SOURCE_FINGERPRINTS de bronze: los loaders borran
+    la huella al empezar a cargar un archivo y la vuelven a escribir (LOADED_TS)
+    recién cuando el mes quedó completo. Cada fila del modelo guarda el
+    LOADED_TS de su archivo como bronze_loaded_ts, y en una corrida incremental
+    solo se procesan los archivos con una huella más nueva que el máximo de
+    bronze_loaded_ts ya construido. Con incremental_strategy='delete+insert' y
+    unique_key='source_file' esos meses se reemplazan completos.
+
+    Los modelos de staging comparan archivo por archivo (built_files): entran los
+    archivos que todavía no están en el modelo y los que tienen una huella más
+    nueva que la que tenían al construirse. Un archivo sin huella (cargado antes
+    de SOURCE_FINGERPRINTS o con la huella fallida) se construye una vez con
+    current_timestamp() como bronze_loaded_ts, así pasa el watermark de los
+    modelos de abajo en vez de quedar para siempre detrás de él.
+
+    dbt run --full-refresh reconstruye todo desde bronze (y es obligatorio la
+    primera vez, para crear las columnas source_file / bronze_loaded_ts).
+#}
+
+{% macro bronze_loads(target_table) %}
+    select source_file, max(loaded_ts) as bronze_loaded_ts
+    from {{ source('bronze', 'source_fingerprints') }}
+    where target_table = '{{ target_table }}'
+    group by source_file
+{% endmacro %}
+
+
+{# archivos ya construidos en el modelo, con la huella con que se construyeron #}
+{% macro built_files() %}
+    select source_file, max(bronze_loaded_ts) as bronze_loaded_ts
+    from {{ this }}
+    group by source_file
+{% endmacro %}
+
+
+{% macro loaded_watermark() %}
+    (select coalesce(max(bronze_loaded_ts), '1900-01-01'::timestamp_ntz) from {{ this }})
+{% endmacro %}
+
+
+{# viajes de trips_all a procesar: todos, o solo los archivos nuevos en una corrida incremental #}
+{% macro incremental_trips() %}
+    select * from {{ ref('trips_all') }}
+    {% if is_incremental() %}
+    where bronze_loaded_ts > {{ loaded_watermark() }}
+    {% endif %}
+{% endmacro %}
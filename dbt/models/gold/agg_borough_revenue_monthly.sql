@@ -0,0 +1,25 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='source_file',
+    on_schema_change='fail'
+) }}
+
+-- ingresos y propinas por borough de origen y mes (el % de propina se calcula
+-- al leer, sumando sobre el rango pedido)
+with trips as (
+    {{ incremental_trips() }}
+)
+
+select
+    t.source_file,
+    split_part(t.source_file, '_', 1)      as service_type,
+    date_trunc('month', t.pickup_datetime) as trip_month,
+    coalesce(z.borough, 'Unknown')         as borough,
+    count(*)                               as trips,
+    sum(t.total_amount)                    as total_revenue,
+    sum(t.tip_amount)                      as total_tips,
+    max(t.bronze_loaded_ts)                as bronze_loaded_ts
+from trips t
+left join {{ ref('stg_zones') }} z on z.location_id = t.pickup_location_id
+group by 1, 2, 3, 4
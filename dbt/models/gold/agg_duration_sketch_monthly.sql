@@ -0,0 +1,26 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='source_file',
+    on_schema_change='fail'
+) }}
+
+-- sketch de percentiles (t-digest de APPROX_PERCENTILE_ACCUMULATE) de la duración
+-- en minutos por zona de origen y mes. Los sketches se combinan con
+-- APPROX_PERCENTILE_COMBINE, así p50/p90 de cualquier rango de meses sale de
+-- leer estas filas en vez de todos los viajes (ver analyses/)
+with trips as (
+    {{ incremental_trips() }}
+)
+
+select
+    source_file,
+    split_part(source_file, '_', 1)      as service_type,
+    date_trunc('month', pickup_datetime) as trip_month,
+    pickup_location_id,
+    count(*)                             as trips,
+    approx_percentile_accumulate(datediff('minute', pickup_datetime, dropoff_datetime)) as duration_sketch,
+    max(bronze_loaded_ts)                as bronze_loaded_ts
+from trips
+where dropoff_datetime >= pickup_datetime
+group by 1, 2, 3, 4
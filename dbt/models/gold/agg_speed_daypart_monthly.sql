@@ -0,0 +1,27 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='source_file',
+    on_schema_change='fail'
+) }}
+
+-- velocidad por borough de origen, franja (día 6-18 h / noche) y mes. Se guardan
+-- la suma de mph y la cantidad de viajes: el promedio de cualquier rango es
+-- sum(sum_mph) / sum(trips)
+with trips as (
+    {{ incremental_trips() }}
+)
+
+select
+    t.source_file,
+    split_part(t.source_file, '_', 1)      as service_type,
+    date_trunc('month', t.pickup_datetime) as trip_month,
+    coalesce(z.borough, 'Unknown')         as borough,
+    case when hour(t.pickup_datetime) between 6 and 17 then 'day' else 'night' end as daypart,
+    count(*)                               as trips,
+    sum(t.trip_distance / (datediff('second', t.pickup_datetime, t.dropoff_datetime) / 3600)) as sum_mph,
+    max(t.bronze_loaded_ts)                as bronze_loaded_ts
+from trips t
+left join {{ ref('stg_zones') }} z on z.location_id = t.pickup_location_id
+where t.dropoff_datetime > t.pickup_datetime
+group by 1, 2, 3, 4, 5
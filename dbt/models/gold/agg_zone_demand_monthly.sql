@@ -0,0 +1,35 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='source_file',
+    on_schema_change='fail'
+) }}
+
+-- viajes por zona y mes, como origen (pickup) y como destino (dropoff)
+with trips as (
+    {{ incremental_trips() }}
+)
+
+select
+    source_file,
+    split_part(source_file, '_', 1)      as service_type,
+    date_trunc('month', pickup_datetime) as trip_month,
+    'pickup'                             as direction,
+    pickup_location_id                   as location_id,
+    count(*)                             as trips,
+    max(bronze_loaded_ts)                as bronze_loaded_ts
+from trips
+group by 1, 2, 3, 4, 5
+
+union all
+
+select
+    source_file,
+    split_part(source_file, '_', 1)      as service_type,
+    date_trunc('month', pickup_datetime) as trip_month,
+    'dropoff'                            as direction,
+    dropoff_location_id                  as location_id,
+    count(*)                             as trips,
+    max(bronze_loaded_ts)                as bronze_loaded_ts
+from trips
+group by 1, 2, 3, 4, 5
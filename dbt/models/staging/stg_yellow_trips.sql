@@ -1,7 +1,17 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='source_file',
+    on_schema_change='fail'
 ) }}
 
+with loads as (
+    {{ bronze_loads('YELLOW_TRIPS') }}
+){% if is_incremental() %},
+built as (
+    {{ built_files() }}
+){% endif %}
+
 select
     vendorid as vendor_id,
     tpep_pickup_datetime as pickup_datetime,
@@ -21,5 +31,14 @@ select
     improvement_surcharge,
     total_amount,
     congestion_surcharge,
-    airport_fee
-from {{ source('bronze','yellow_trips') }}
+    airport_fee,
+    b.source_file,
+    coalesce(l.bronze_loaded_ts, current_timestamp()::timestamp_ntz) as bronze_loaded_ts
+from {{ source('bronze','yellow_trips') }} b
+left join loads l on l.source_file = b.source_file
+{% if is_incremental() %}
+left join built t on t.source_file = b.source_file
+-- solo los meses que faltan o con una carga nueva en bronze desde que se construyeron
+where t.source_file is null
+   or l.bronze_loaded_ts > t.bronze_loaded_ts
+{% endif %}
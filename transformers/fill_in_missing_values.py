@@ -1,5 +1,5 @@
 from pandas import DataFrame
-import math
+from utils.imputation import MedianImputer
 
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
@@ -10,12 +10,13 @@ def select_number_columns(df: DataFrame) -> DataFrame:
     return df[['Age', 'Fare', 'Parch', 'Pclass', 'SibSp', 'Survived']]
 
 
-def fill_missing_values_with_median(df: DataFrame) -> DataFrame:
-    for col in df.columns:
-        values = sorted(df[col].dropna().tolist())
-        median_age = values[math.floor(len(values) / 2)]
-        df[[col]] = df[[col]].fillna(median_age)
-    return df
+def fill_missing_values_with_median(df: DataFrame, method:str='exact') -> DataFrame:
+    """
+    Completa los nulos de cada columna con su mediana (todas las columnas en una
+    pasada, en el mismo frame). method='approx' usa el sketch de utils.imputation;
+    para archivos que no entran en memoria ver impute_parquet.
+    """
+    return MedianImputer(method=method).fit(df).transform(df)
 
 
 @transformer
@@ -34,7 +35,8 @@ def transform_df(df: DataFrame, *args, **kwargs) -> DataFrame:
     """
     # Specify your transformation logic here
 
-    return fill_missing_values_with_median(select_number_columns(df))
+    return fill_missing_values_with_median(select_number_columns(df),
+                                           method=kwargs.get('median_method', 'exact'))
 
 
 @test
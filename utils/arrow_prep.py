@@ -0,0 +1,143 @@
+# preprocesamiento local con pyarrow antes del PUT al stage
+#
+# Lee el Parquet descargado de a un row group, normaliza nombres de columnas que
+# cambian entre años (Airport_fee / airport_fee), castea a los tipos destino,
+# opcionalmente aplica las reglas de calidad de silver como máscaras vectorizadas,
+# descarta columnas que no se usan y escribe un Parquet compacto con zstd.
+# En silver además agrega borough / zone / service_zone de pickup y dropoff con
+# un gather sobre el lookup de utils.taxi_zones.
+# La memoria queda acotada a un row group.
+
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from utils.taxi_zones import ZONE_FIELDS, ZONE_PREFIXES, get_zone_lookup
+from utils.typed_copy import GREEN_BRONZE_SPEC, YELLOW_BRONZE_SPEC
+
+SPECS = {"yellow": YELLOW_BRONZE_SPEC, "green": GREEN_BRONZE_SPEC}
+PICKUP_COL = {"yellow": "tpep_pickup_datetime", "green": "lpep_pickup_datetime"}
+DROPOFF_COL = {"yellow": "tpep_dropoff_datetime", "green": "lpep_dropoff_datetime"}
+US_PER_HOUR = 3_600_000_000
+ZONES_VERSION_KEY = b"taxi_zones_version"
+
+
+def _arrow_type(sf_type):
+    if sf_type == "NUMBER":
+        return pa.int64()
+    if sf_type.startswith("NUMBER"):
+        return pa.float64()
+    if sf_type.startswith("TIMESTAMP"):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def target_schema(service, zones=None):
+    """
+    Esquema de salida: nombres canónicos de la fuente y tipos destino (más las
+    columnas de zona y la versión del lookup en la metadata si hay zones).
+    """
+    schema = pa.schema([(src, _arrow_type(sf_type)) for _, src, sf_type, _ in SPECS[service]])
+    if zones is None:
+        return schema
+    for prefix in ZONE_PREFIXES:
+        for field in ZONE_FIELDS:
+            schema = schema.append(pa.field(f"{prefix}_{field}", pa.string()))
+    return schema.with_metadata({ZONES_VERSION_KEY: zones.version.encode()})
+
+
+def normalize_table(table, service):
+    """
+    Renombra (sin distinguir mayúsculas), castea y completa con nulos las columnas
+    del spec; el resto de columnas se descarta.
+    """
+    schema = target_schema(service)
+    by_lower = {name.lower(): name for name in table.column_names}
+    columns = []
+    for field in schema:
+        actual = by_lower.get(field.name.lower())
+        if actual is None:
+            columns.append(pa.nulls(table.num_rows, type=field.type))
+        else:
+            columns.append(pc.cast(table[actual], field.type, safe=False))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def quality_mask(table, service):
+    """
+    Reglas de calidad de load_yellow_to_silver / load_green_to_silver:
+    pickup/dropoff no nulos, distancia y total >= 0 y (solo yellow)
+    DATEDIFF('hour', pickup, dropoff) <= 24. Los nulos descartan la fila, igual
+    que en el WHERE de Snowflake.
+    """
+    pickup = table[PICKUP_COL[service]]
+    dropoff = table[DROPOFF_COL[service]]
+    mask = pc.and_(pc.is_valid(pickup), pc.is_valid(dropoff))
+    mask = pc.and_(mask, pc.greater_equal(table["trip_distance"], 0))
+    mask = pc.and_(mask, pc.greater_equal(table["total_amount"], 0))
+    if service == "yellow":
+        # DATEDIFF('hour') cuenta cruces de hora: se comparan las horas truncadas
+        pickup_h = pc.divide(pc.cast(pickup, pa.int64()), US_PER_HOUR)
+        dropoff_h = pc.divide(pc.cast(dropoff, pa.int64()), US_PER_HOUR)
+        mask = pc.and_(mask, pc.less_equal(pc.subtract(dropoff_h, pickup_h), 24))
+    return mask
+
+
+def preprocess_parquet(src_path, dst_path, *, service, apply_quality=False, zones=None,
+                       compression="zstd", compression_level=None):
+    """
+    Procesa src_path row group por row group y escribe dst_path (atómico vía .part).
+    zones (un ZoneLookup) agrega las columnas de zona de pickup/dropoff.
+    Devuelve conteos de filas y bytes de entrada/salida.
+    """
+    pf = pq.ParquetFile(src_path)
+    schema = target_schema(service, zones)
+    part_path = dst_path + ".part"
+    rows_out = 0
+
+    with pq.ParquetWriter(part_path, schema, compression=compression,
+                          compression_level=compression_level) as writer:
+        for i in range(pf.num_row_groups):
+            table = normalize_table(pf.read_row_group(i), service)
+            if apply_quality:
+                table = table.filter(quality_mask(table, service))
+            if zones is not None:
+                table = zones.enrich(table).replace_schema_metadata(schema.metadata)
+            if table.num_rows:
+                writer.write_table(table)
+                rows_out += table.num_rows
+
+    os.replace(part_path, dst_path)
+    stats = {
+        "rows_in": pf.metadata.num_rows,
+        "rows_out": rows_out,
+        "bytes_in": os.path.getsize(src_path),
+        "bytes_out": os.path.getsize(dst_path),
+    }
+    print(f"🧹 {os.path.basename(src_path)}: {stats['rows_in']} → {rows_out} filas, "
+          f"{stats['bytes_in'] / 1e6:.1f} → {stats['bytes_out'] / 1e6:.1f} MB")
+    return stats
+
+
+def prepare_for_upload(local_path, service, *, apply_quality=False):
+    """
+    Devuelve (ruta_a_subir, filas) del archivo preprocesado. Se guarda junto al
+    original en prepared/ (o prepared_silver/, con reglas de calidad y zonas) con
+    el mismo nombre, para que el stage y SOURCE_FILE no cambien; si ya está al
+    día (y enriquecido con la versión actual de taxi zones) se reutiliza.
+    """
+    subdir = "prepared_silver" if apply_quality else "prepared"
+    dst_dir = os.path.join(os.path.dirname(local_path), subdir)
+    os.makedirs(dst_dir, exist_ok=True)
+    dst_path = os.path.join(dst_dir, os.path.basename(local_path))
+    zones = get_zone_lookup() if apply_quality else None
+
+    if os.path.exists(dst_path) and os.path.getmtime(dst_path) >= os.path.getmtime(local_path):
+        meta = pq.ParquetFile(dst_path).metadata
+        version = (meta.metadata or {}).get(ZONES_VERSION_KEY)
+        if zones is None or version == zones.version.encode():
+            return dst_path, meta.num_rows
+
+    stats = preprocess_parquet(local_path, dst_path, service=service, apply_quality=apply_quality,
+                               zones=zones)
+    return dst_path, stats["rows_out"]
@@ -0,0 +1,136 @@
+# escritor de auditoría con buffer (INGEST_AUDIT / GREEN_TRIPS_METADATA)
+#
+# En vez de un INSERT de una fila por chunk, los eventos se acumulan en memoria
+# y se vuelcan como un único INSERT multi-fila al terminar el mes, ante un error
+# o cuando pasó flush_interval segundos desde el último volcado.
+# Cada evento se escribe antes en un spool local append-only (JSON por línea,
+# con fsync), que se borra recién cuando el INSERT terminó bien. Si el proceso
+# muere, la próxima corrida del mismo archivo retoma el spool y lo vuelca: las
+# filas no se pierden (a lo sumo se repiten si la caída fue justo después del
+# INSERT y antes de borrar el spool).
+# Con metric_columns=True se agregan ELAPSED_SEC / ROWS_PER_SEC del span de cada
+# evento (ver utils.metrics) como columnas extra de la tabla de auditoría.
+
+import json
+import os
+import time
+from datetime import datetime
+from utils.metrics import span
+from utils.snowflake_pool import bootstrap_once
+
+SPOOL_DIR = "data/audit_spool"
+MAX_ROWS_PER_INSERT = 1000
+AUDIT_COLUMNS = ("RUN_ID", "SERVICE", "YEAR", "MONTH", "SOURCE_FILE", "CHUNK_INDEX", "CHUNK_SIZE",
+                 "ROWS_IN_FILE", "ROWS_INSERTED", "STATUS", "ERROR_MESSAGE")
+METRIC_COLUMNS = {"ELAPSED_SEC": "elapsed_sec", "ROWS_PER_SEC": "rows_per_sec"}
+
+
+def ensure_metric_columns(cur, table_ref):
+    bootstrap_once(cur, f"{table_ref}:metrics", *[
+        f"ALTER TABLE {table_ref} ADD COLUMN IF NOT EXISTS {col} FLOAT" for col in METRIC_COLUMNS
+    ])
+
+
+class AuditWriter:
+    """
+    Buffer de filas de auditoría para una tabla y un archivo fuente.
+    columns son las columnas que pasa el loader; si ts_column está definida,
+    se completa con la hora UTC del evento (no la del volcado).
+    """
+
+    def __init__(self, cur, table_ref, columns, *, spool_key, ts_column=None,
+                 metric_columns=False, flush_interval=60.0, spool_dir=SPOOL_DIR):
+        self.cur = cur
+        self.table_ref = table_ref
+        self.metric_columns = metric_columns
+        self.columns = (list(columns) + ([ts_column] if ts_column else [])
+                        + (list(METRIC_COLUMNS) if metric_columns else []))
+        self.ts_column = ts_column
+        if metric_columns:
+            ensure_metric_columns(cur, table_ref)
+        self.flush_interval = flush_interval
+        self.rows = []
+        self.last_flush = time.monotonic()
+
+        os.makedirs(spool_dir, exist_ok=True)
+        safe_table = table_ref.replace(".", "_")
+        self.spool_path = os.path.join(spool_dir, f"{safe_table}__{spool_key}.jsonl")
+        self._recover()
+
+    def _recover(self):
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break  # última línea a medio escribir por la caída
+                # el spool puede venir de una corrida con otras columnas opcionales
+                self.rows.append((row + [None] * len(self.columns))[:len(self.columns)])
+        if self.rows:
+            print(f"♻️ {len(self.rows)} filas de auditoría pendientes recuperadas de {self.spool_path}")
+
+    def add(self, *values, metrics=None):
+        """
+        Registra un evento (valores en el orden de columns). Lo persiste en el
+        spool antes de dejarlo en el buffer. metrics es el span (utils.metrics)
+        de la etapa, usado para las columnas de métricas.
+        """
+        row = list(values)
+        if self.ts_column:
+            row.append(datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"))
+        if self.metric_columns:
+            row.extend((metrics or {}).get(key) for key in METRIC_COLUMNS.values())
+        with open(self.spool_path, "a") as f:
+            f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows.append(row)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Vuelca el buffer con INSERTs multi-fila. Nunca lanza: si Snowflake falla,
+        las filas quedan en el spool para la próxima corrida. Devuelve True si
+        el buffer quedó vacío.
+        """
+        self.last_flush = time.monotonic()
+        if not self.rows:
+            return True
+        cols = ",".join(self.columns)
+        placeholders = "(" + ",".join(["%s"] * len(self.columns)) + ")"
+        try:
+            with span("audit_write", rows=len(self.rows)):
+                while self.rows:
+                    batch = self.rows[:MAX_ROWS_PER_INSERT]
+                    params = [v for row in batch for v in row]
+                    self.cur.execute(
+                        f"INSERT INTO {self.table_ref} ({cols}) VALUES "
+                        + ",".join([placeholders] * len(batch)),
+                        params,
+                    )
+                    self.rows = self.rows[len(batch):]
+        except Exception as e:
+            self._rewrite_spool()
+            print(f"⚠️ No se pudo volcar la auditoría ({e}); queda en {self.spool_path}")
+            return False
+        os.remove(self.spool_path)
+        return True
+
+    def _rewrite_spool(self):
+        # deja en el spool solo lo que todavía no se insertó
+        part_path = self.spool_path + ".part"
+        with open(part_path, "w") as f:
+            for row in self.rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(part_path, self.spool_path)
+
+    def close(self):
+        return self.flush()
@@ -0,0 +1,148 @@
+# utilidades compartidas por los bloques de backfill (bronze y silver)
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.source_cache import PinScope, get_source_cache, pinning
+
+TMP_TABLE_PREFIX = "_TMP_RAW_VARIANT"
+
+
+def month_range(start_year, start_month, end_year, end_month):
+    """
+    Lista de (año, mes) desde start hasta end, ambos inclusive.
+    """
+    months = []
+    y, m = start_year, start_month
+    while (y < end_year) or (y == end_year and m <= end_month):
+        months.append((y, m))
+        if m == 12:
+            y += 1
+            m = 1
+        else:
+            m += 1
+    return months
+
+
+def tmp_table_name(service, year, month):
+    """
+    Nombre único de tabla temporal por servicio/mes, para que dos workers
+    concurrentes nunca compartan el mismo staging.
+    """
+    return f"{TMP_TABLE_PREFIX}_{service.upper()}_{year}{month:02d}"
+
+
+def default_result(year, month, res):
+    """
+    Forma del resultado por mes que devuelven los backfills.
+    """
+    return {"year": year, "month": month, "status": res.get("status", "OK"),
+            "rows_inserted": res.get("rows_inserted"),
+            "rows_in_file": res.get("rows_in_file")}
+
+
+def run_months(load_fn, months, *, max_workers=1, result_fn=default_result, **load_kwargs):
+    """
+    Ejecuta load_fn(year=..., month=..., **load_kwargs) para cada mes con un pool
+    acotado de max_workers hilos. Cada llamada abre su propia conexión y usa su
+    propia tabla temporal (load_fn recibe tmp_table). Los resultados vuelven en
+    el mismo orden que months. Los archivos fuente del mes quedan fijados en la
+    caché de descargas hasta que el mes termina.
+    """
+    max_workers = max(1, int(max_workers))
+
+    def _run(y, m):
+        print(f"\n=== Procesando {y}-{m:02d} ===")
+        try:
+            with pinning():
+                res = load_fn(year=y, month=m, **load_kwargs)
+            return result_fn(y, m, res)
+        except Exception as e:
+            print(f"⚠️ Error en {y}-{m:02d}: {e}")
+            return {"year": y, "month": m, "status": "ERROR", "error": str(e)}
+
+    if max_workers == 1:
+        return [_run(y, m) for (y, m) in months]
+
+    results = [None] * len(months)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="month") as pool:
+        futures = {pool.submit(_run, y, m): i for i, (y, m) in enumerate(months)}
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+    return results
+
+
+_DONE = object()
+
+
+def run_months_pipelined(load_fn, months, *, download_fn, upload_fn, queue_size=2,
+                         result_fn=default_result, **load_kwargs):
+    """
+    Modo pipeline: descarga → PUT → (COPY + INSERT) en tres hilos unidos por colas
+    acotadas (queue_size). Mientras el mes N se copia e inserta en el warehouse, el
+    mes N+1 ya se está descargando/subiendo; la descarga se frena cuando hay
+    queue_size meses esperando, así disco y memoria quedan acotados.
+
+    download_fn(year=, month=) devuelve False si el mes no existe en la fuente;
+    upload_fn(year=, month=) hace el PUT. load_fn recibe staged=True cuando ambas
+    etapas terminaron; si no, hace todo el mes por su cuenta (y registra MISSING).
+    Solo load_fn usa el warehouse: no se multiplican sesiones de cómputo.
+    Lo que descarga un mes queda fijado en la caché de descargas (PinScope que
+    viaja con el mes por las colas) hasta que su load_fn termina.
+    """
+    downloaded = queue.Queue(maxsize=max(1, int(queue_size)))
+    uploaded = queue.Queue(maxsize=max(1, int(queue_size)))
+
+    def _download():
+        for (y, m) in months:
+            pins = PinScope(get_source_cache())
+            try:
+                with pinning(pins, release=False):
+                    ok = download_fn(year=y, month=m)
+                downloaded.put((y, m, pins, ok, None))
+            except Exception as e:
+                downloaded.put((y, m, pins, False, e))
+        downloaded.put(_DONE)
+
+    def _upload():
+        while True:
+            item = downloaded.get()
+            if item is _DONE:
+                uploaded.put(_DONE)
+                return
+            y, m, pins, ok, err = item
+            if ok:
+                try:
+                    upload_fn(year=y, month=m)
+                except Exception as e:
+                    ok, err = False, e
+            uploaded.put((y, m, pins, ok, err))
+
+    threads = [threading.Thread(target=_download, name="pipeline-download", daemon=True),
+               threading.Thread(target=_upload, name="pipeline-upload", daemon=True)]
+    for t in threads:
+        t.start()
+
+    results = []
+    while True:
+        item = uploaded.get()
+        if item is _DONE:
+            break
+        y, m, pins, staged, err = item
+        print(f"\n=== Procesando {y}-{m:02d} (pipeline) ===")
+        if err is not None:
+            pins.release()
+            print(f"⚠️ Error en {y}-{m:02d}: {err}")
+            results.append({"year": y, "month": m, "status": "ERROR", "error": str(err)})
+            continue
+        try:
+            with pinning(pins):
+                res = load_fn(year=y, month=m, staged=staged, **load_kwargs)
+            results.append(result_fn(y, m, res))
+        except Exception as e:
+            print(f"⚠️ Error en {y}-{m:02d}: {e}")
+            results.append({"year": y, "month": m, "status": "ERROR", "error": str(e)})
+
+    for t in threads:
+        t.join()
+    return results
@@ -0,0 +1,186 @@
+# extracción masiva de tablas de silver / gold a Parquet local particionado
+#
+# export_partitions() lista las particiones (servicio, año, mes) de la tabla con
+# su conteo y exporta cada una con su propio SELECT, leyendo el resultado como
+# tablas de Arrow (cursor.fetch_arrow_batches: el conector baja los chunks del
+# resultado en paralelo, sin pasar por tuplas ni DataFrame) y escribiéndolas a
+# medida que llegan, así la memoria queda acotada a un batch por worker.
+# Layout Hive: <out_dir>/service=<s>/year=<yyyy>/month=<mm>/part-0.parquet (zstd).
+# Cada partición terminada deja _SUCCESS con sus filas: la siguiente corrida
+# salta las que ya tienen todas las filas que hoy tiene la tabla y rehace el
+# resto (un .part a medias se descarta). max_workers particiones corren a la
+# vez, cada una con su conexión.
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.metrics import span
+from utils.warehouse import acquire_connection, release_connection
+
+EXPORT_DIR = "data/exports"
+SUCCESS_FILE = "_SUCCESS"
+PART_NAME = "part-0.parquet"
+
+
+def month_start(ym, offset=0):
+    """
+    'yyyy-mm' (+ offset meses) → 'yyyy-mm-01'.
+    """
+    y, m = (int(x) for x in ym.split("-"))
+    y, m = divmod(y * 12 + m - 1 + offset, 12)
+    return f"{y}-{m + 1:02d}-01"
+
+
+def partition_dir(out_dir, service, year, month):
+    return os.path.join(out_dir, f"service={str(service).lower()}", f"year={int(year)}", f"month={int(month):02d}")
+
+
+def list_partitions(cur, table_ref, service_col, date_col, start, end):
+    """
+    [(servicio, año, mes, filas)] de table_ref entre start (inclusive) y end (exclusivo).
+    """
+    cur.execute(f"""
+        SELECT {service_col}, YEAR({date_col}), MONTH({date_col}), COUNT(*)
+        FROM {table_ref}
+        WHERE {date_col} >= %s AND {date_col} < %s
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+    """, (start, end))
+    return [(s, int(y), int(m), int(n)) for s, y, m, n in cur.fetchall()]
+
+
+def _normalize(table, schema=None):
+    """
+    El conector puede devolver enteros de distinto ancho según el chunk: todo
+    entero pasa a int64 y cada batch se castea al esquema del primero.
+    """
+    if schema is None:
+        schema = pa.schema([pa.field(f.name, pa.int64()) if pa.types.is_integer(f.type) else f
+                            for f in table.schema])
+    return table.cast(schema), schema
+
+
+def read_success(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def export_partition(table_ref, service, year, month, expected_rows, out_dir, *,
+                     service_col, date_col, columns="*", schema=None, force=False):
+    """
+    Exporta una partición a su carpeta Hive. Devuelve las estadísticas
+    (status EXPORTED o SKIPPED si _SUCCESS ya tiene las mismas filas).
+    """
+    dst_dir = partition_dir(out_dir, service, year, month)
+    success_path = os.path.join(dst_dir, SUCCESS_FILE)
+    done = read_success(success_path)
+    stats = {"service": service, "year": year, "month": month, "expected_rows": expected_rows}
+    if not force and done and done.get("rows") == expected_rows and os.path.exists(os.path.join(dst_dir, PART_NAME)):
+        return {**stats, "status": "SKIPPED", "rows": done["rows"], "bytes": done.get("bytes"),
+                "seconds": 0.0, "rows_per_sec": None}
+
+    os.makedirs(dst_dir, exist_ok=True)
+    if os.path.exists(success_path):
+        os.remove(success_path)
+    part_path = os.path.join(dst_dir, PART_NAME + ".part")
+    month_key = f"{year}-{month:02d}"
+
+    conn, _, _ = acquire_connection(schema=schema)
+    cur = conn.cursor()
+    writer = None
+    rows = 0
+    start = time.perf_counter()
+    try:
+        with span("export", file=f"{service}/{month_key}") as sp:
+            cur.execute(f"""
+                SELECT {columns}
+                FROM {table_ref}
+                WHERE {service_col} = %s AND {date_col} >= %s AND {date_col} < %s
+            """, (service, month_start(month_key), month_start(month_key, 1)))
+            arrow_schema = None
+            for table in cur.fetch_arrow_batches():
+                table, arrow_schema = _normalize(table, arrow_schema)
+                if writer is None:
+                    writer = pq.ParquetWriter(part_path, arrow_schema, compression="zstd")
+                writer.write_table(table)
+                rows += table.num_rows
+            if writer is not None:
+                writer.close()
+                writer = None
+            sp["rows"] = rows
+    finally:
+        if writer is not None:
+            writer.close()
+        cur.close()
+        release_connection(conn)
+
+    if not rows:
+        return {**stats, "status": "EMPTY", "rows": 0, "bytes": 0, "seconds": 0.0, "rows_per_sec": None}
+    final_path = os.path.join(dst_dir, PART_NAME)
+    os.replace(part_path, final_path)
+    elapsed = time.perf_counter() - start
+    stats.update({"status": "EXPORTED", "rows": rows, "bytes": os.path.getsize(final_path),
+                  "seconds": round(elapsed, 3), "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None})
+    with open(success_path, "w") as f:
+        json.dump({"table": table_ref, "rows": rows, "expected_rows": expected_rows,
+                   "bytes": stats["bytes"], "seconds": stats["seconds"]}, f)
+    if rows != expected_rows:
+        print(f"⚠️ {service} {month_key}: {rows} filas exportadas y {expected_rows} contadas "
+              f"(la tabla cambió durante la exportación)")
+    print(f"📤 {service} {month_key}: {rows} filas en {elapsed:.1f}s ({stats['rows_per_sec']} filas/s)")
+    return stats
+
+
+def export_partitions(table, start, end, *, out_dir=None, service_col="SERVICE_TYPE",
+                      date_col="PICKUP_DATETIME", columns="*", max_workers=4, force=False):
+    """
+    Exporta table ('SCHEMA.TABLA') desde el mes start hasta end ('yyyy-mm',
+    ambos inclusive) a Parquet particionado por servicio/año/mes. Devuelve un
+    resumen con filas, particiones exportadas / salteadas y filas/s.
+    """
+    schema, table_name = table.split(".")
+    out_dir = out_dir or os.path.join(EXPORT_DIR, table_name.lower())
+    conn, sf_database, _ = acquire_connection(schema=schema)
+    cur = conn.cursor()
+    table_ref = f"{sf_database}.{schema}.{table_name}"
+    try:
+        partitions = list_partitions(cur, table_ref, service_col, date_col,
+                                     month_start(start), month_start(end, 1))
+    finally:
+        cur.close()
+        release_connection(conn)
+    print(f"📦 {table_ref}: {len(partitions)} particiones, {sum(p[3] for p in partitions)} filas → {out_dir}")
+
+    def _export(part):
+        service, year, month, expected = part
+        return export_partition(table_ref, service, year, month, expected, out_dir,
+                                service_col=service_col, date_col=date_col, columns=columns,
+                                schema=schema, force=force)
+
+    start_ts = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="export") as pool:
+        results = list(pool.map(_export, partitions))
+    elapsed = time.perf_counter() - start_ts
+
+    exported = [r for r in results if r["status"] == "EXPORTED"]
+    rows = sum(r["rows"] for r in exported)
+    summary = {
+        "table": table_ref,
+        "out_dir": out_dir,
+        "partitions": len(results),
+        "exported": len(exported),
+        "skipped": sum(r["status"] == "SKIPPED" for r in results),
+        "rows_exported": rows,
+        "bytes_exported": sum(r["bytes"] for r in exported),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 and rows else None,
+    }
+    print(f"✅ {summary['exported']} exportadas, {summary['skipped']} ya estaban: "
+          f"{rows} filas en {elapsed:.1f}s ({summary['rows_per_sec']} filas/s)")
+    return summary
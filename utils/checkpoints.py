@@ -0,0 +1,106 @@
+# checkpoints por chunk para retomar un mes a medio cargar
+#
+# Cada INSERT de chunk va en la misma transacción que su fila en
+# <schema>.LOAD_CHECKPOINTS, así un chunk está confirmado si y solo si tiene
+# checkpoint. Si el mes falla en el chunk 9 de 12, la siguiente corrida (con el
+# mismo archivo y el mismo chunk_size) no borra el mes: vuelve a armar el staging
+# desde el stage y sigue desde el primer chunk sin checkpoint. Los checkpoints se
+# borran antes de empezar un mes de cero y al terminarlo bien.
+# Un reintento de chunk (recheck=True) mira antes su checkpoint: si el intento
+# anterior sí llegó a confirmar (por ejemplo se cortó la conexión esperando la
+# respuesta del COMMIT) no vuelve a insertar.
+
+from utils.snowflake_pool import bootstrap_once
+
+CHECKPOINT_TABLE = "LOAD_CHECKPOINTS"
+
+
+def ensure_checkpoint_table(cur, schema_ref):
+    bootstrap_once(cur, f"{schema_ref}.{CHECKPOINT_TABLE}", f"""
+        CREATE TABLE IF NOT EXISTS {schema_ref}.{CHECKPOINT_TABLE} (
+            TARGET_TABLE   STRING,
+            SOURCE_FILE    STRING,
+            CHUNK_SIZE     NUMBER,
+            ROWS_STAGED    NUMBER,
+            CHUNK_INDEX    NUMBER,
+            ROWS_INSERTED  NUMBER,
+            COMMITTED_TS   TIMESTAMP_NTZ
+        )
+    """)
+
+
+def clear_checkpoints(cur, schema_ref, fname):
+    cur.execute(f"DELETE FROM {schema_ref}.{CHECKPOINT_TABLE} WHERE SOURCE_FILE = %s", (fname,))
+
+
+def resume_chunks(cur, schema_ref, target_table, fname, chunk_size, rows_staged):
+    """
+    {chunk: filas} de los chunks ya confirmados de fname en target_table, o {} si
+    hay que empezar de cero: sin checkpoints, otro chunk_size / archivo, o la
+    tabla no tiene exactamente las filas que dicen los checkpoints.
+    """
+    cur.execute(f"""
+        SELECT CHUNK_INDEX, ROWS_INSERTED, CHUNK_SIZE, ROWS_STAGED, TARGET_TABLE
+        FROM {schema_ref}.{CHECKPOINT_TABLE}
+        WHERE SOURCE_FILE = %s
+    """, (fname,))
+    rows = cur.fetchall()
+    if not rows:
+        return {}
+    if any((r[2], r[3], r[4]) != (chunk_size, rows_staged, target_table) for r in rows):
+        print(f"⚠️ checkpoints de {fname} de otra corrida (chunk_size/archivo/destino), se empieza de cero")
+        return {}
+
+    done = {int(r[0]): int(r[1]) for r in rows}
+    try:
+        cur.execute(f"SELECT COUNT(*) FROM {schema_ref}.{target_table} WHERE SOURCE_FILE = %s", (fname,))
+        landed = cur.fetchone()[0]
+    except Exception as e:
+        print(f"⚠️ no se pudo validar {target_table} para retomar {fname} ({e}), se empieza de cero")
+        return {}
+    if landed != sum(done.values()):
+        print(f"⚠️ {target_table} tiene {landed} filas de {fname} y los checkpoints "
+              f"{sum(done.values())}, se empieza de cero")
+        return {}
+    return done
+
+
+def committed_rows(cur, schema_ref, target_table, fname, chunk_size, rows_staged, chunk_index):
+    """
+    Filas del checkpoint del chunk si ya está confirmado, si no None.
+    """
+    cur.execute(f"""
+        SELECT ROWS_INSERTED
+        FROM {schema_ref}.{CHECKPOINT_TABLE}
+        WHERE TARGET_TABLE = %s AND SOURCE_FILE = %s AND CHUNK_SIZE = %s
+          AND ROWS_STAGED = %s AND CHUNK_INDEX = %s
+    """, (target_table, fname, chunk_size, rows_staged, chunk_index))
+    row = cur.fetchone()
+    return int(row[0]) if row else None
+
+
+def commit_chunk(cur, schema_ref, target_table, fname, chunk_size, rows_staged, chunk_index, insert_sql,
+                 recheck=False):
+    """
+    INSERT del chunk + su checkpoint en una transacción. Devuelve las filas
+    insertadas. Con recheck (reintentos) un chunk ya confirmado no se repite.
+    """
+    if recheck:
+        rows = committed_rows(cur, schema_ref, target_table, fname, chunk_size, rows_staged, chunk_index)
+        if rows is not None:
+            print(f"↩️ chunk {chunk_index} de {fname} ya estaba confirmado, no se repite")
+            return rows
+    cur.execute("BEGIN")
+    try:
+        cur.execute(insert_sql)
+        inserted = cur.rowcount
+        cur.execute(f"""
+            INSERT INTO {schema_ref}.{CHECKPOINT_TABLE}
+            (TARGET_TABLE,SOURCE_FILE,CHUNK_SIZE,ROWS_STAGED,CHUNK_INDEX,ROWS_INSERTED,COMMITTED_TS)
+            VALUES (%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP())
+        """, (target_table, fname, chunk_size, rows_staged, chunk_index, inserted))
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+    return inserted
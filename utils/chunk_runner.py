@@ -0,0 +1,85 @@
+# INSERTs de chunks en vuelo a la vez dentro de un mes
+#
+# Los chunks de un mes leen rangos disjuntos del staging (WHERE CHUNK_ID = n), así
+# que no hace falta esperar a uno para mandar el siguiente. run_chunks() mantiene
+# hasta max_in_flight chunks en vuelo, cada uno en su propia sesión del pool: en
+# Snowflake una query asíncrona no puede ir dentro de una transacción explícita
+# y cada chunk necesita INSERT + checkpoint en la misma (utils.checkpoints), así
+# que cada chunk en vuelo es una sesión bloqueada en su transacción. El hilo
+# principal sondea los que van terminando (wait FIRST_COMPLETED con timeout) y
+# anota el resultado final de cada chunk una sola vez, siempre desde ese hilo
+# (AuditWriter no se comparte entre hilos).
+# Si un chunk falla ya agotados sus reintentos no se mandan más, se esperan los
+# que están en vuelo y se relanza el primer error: los confirmados quedan con su
+# checkpoint y la siguiente corrida sigue desde los que faltan.
+# Con max_in_flight=1 los chunks corren en orden sobre el cursor del mes.
+# Cada chunk corre en una copia del contexto del hilo que llama (contextvars),
+# así sus spans conservan los tags service / year / month / file del mes.
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.warehouse import acquire_connection, release_connection
+
+POLL_SECONDS = 5.0
+
+
+def _on_own_session(insert_chunk, chunk_index, schema):
+    conn, _, _ = acquire_connection(schema=schema)
+    cur = conn.cursor()
+    try:
+        return insert_chunk(cur, chunk_index)
+    finally:
+        cur.close()
+        release_connection(conn)
+
+
+def run_chunks(cur, chunks, insert_chunk, on_done, *, max_in_flight=1, schema=None,
+               poll_seconds=POLL_SECONDS):
+    """
+    insert_chunk(cur, chunk_index) inserta un chunk (con sus reintentos) y
+    devuelve su span; on_done(chunk_index, sp, error) se llama una vez por
+    chunk, en el hilo que llamó, con el resultado final. Con max_in_flight > 1
+    el staging tiene que ser visible desde otras sesiones (shared=True en
+    copy_to_chunked_staging) y cada chunk usa una conexión del pool de schema.
+    """
+    chunks = list(chunks)
+    if max_in_flight <= 1 or len(chunks) <= 1:
+        for chunk_index in chunks:
+            try:
+                sp = insert_chunk(cur, chunk_index)
+            except Exception as e:
+                on_done(chunk_index, None, e)
+                raise
+            on_done(chunk_index, sp, None)
+        return
+
+    pending = iter(chunks)
+    in_flight = {}
+    first_error = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="chunk") as pool:
+        def submit_next():
+            chunk_index = next(pending, None)
+            if chunk_index is not None:
+                ctx = contextvars.copy_context()
+                in_flight[pool.submit(ctx.run, _on_own_session, insert_chunk, chunk_index, schema)] = chunk_index
+
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            finished, _ = wait(in_flight, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            if not finished:
+                print(f"⏳ {len(in_flight)} chunks en vuelo ({time.perf_counter() - start:.0f}s): "
+                      f"{sorted(in_flight.values())}")
+                continue
+            for future in finished:
+                chunk_index = in_flight.pop(future)
+                error = future.exception()
+                on_done(chunk_index, None if error else future.result(), error)
+                if error is not None:
+                    first_error = first_error or error
+                elif first_error is None:
+                    submit_next()
+    if first_error is not None:
+        raise first_error
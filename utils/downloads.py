@@ -0,0 +1,143 @@
+# descargas compartidas por los loaders: streaming a disco, reanudables y atómicas
+# (los archivos descargados quedan bajo la caché de utils.source_cache)
+
+import os
+import time
+import requests
+from utils.metrics import span
+from utils.source_cache import get_source_cache
+
+BLOCK_SIZE = 8 * 1024 * 1024  # 8 MiB por bloque
+PARQUET_MAGIC = b"PAR1"
+
+
+class SourceNotFound(Exception):
+    """
+    La fuente respondió 404 (el archivo del mes aún no está publicado).
+    """
+
+
+def is_valid_parquet(path):
+    """
+    Chequeo barato de integridad: magic PAR1 al inicio y al final y un footer
+    cuyo largo cabe en el archivo. Detecta descargas truncadas sin leer datos.
+    """
+    size = os.path.getsize(path)
+    if size < 12:
+        return False
+    with open(path, "rb") as f:
+        head = f.read(4)
+        f.seek(-8, os.SEEK_END)
+        tail = f.read(8)
+    footer_len = int.from_bytes(tail[:4], "little")
+    return head == PARQUET_MAGIC and tail[4:] == PARQUET_MAGIC and footer_len + 12 <= size
+
+
+def _total_size(resp, offset):
+    """
+    Tamaño total esperado según Content-Range (206) o Content-Length (200).
+    """
+    content_range = resp.headers.get("Content-Range")
+    if resp.status_code == 206 and content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = resp.headers.get("Content-Length")
+    if length is None:
+        return None
+    return int(length) + (offset if resp.status_code == 206 else 0)
+
+
+def download_file(url, local_path, *, block_size=BLOCK_SIZE, retries=5, delay=5,
+                  timeout=180, validate=is_valid_parquet):
+    """
+    Descarga url a local_path en bloques de block_size sin cargar el archivo en memoria.
+    Escribe a local_path + '.part', reanuda con HTTP Range si se corta la conexión y
+    solo renombra al destino cuando el tamaño y validate(path) son correctos.
+    Lanza SourceNotFound si la fuente responde 404.
+    """
+    part_path = local_path + ".part"
+    total = None
+    etag = last_modified = None
+    downloaded = 0
+    start = time.time()
+
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+                if r.status_code == 404:
+                    raise SourceNotFound(f"HTTP 404: {url}")
+                if r.status_code == 416:
+                    # el .part ya tiene todo el archivo
+                    break
+                r.raise_for_status()
+                if r.status_code == 200:
+                    offset = 0  # el servidor ignoró el Range: empezar de cero
+                total = _total_size(r, offset)
+                etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for block in r.iter_content(chunk_size=block_size):
+                        f.write(block)
+                        downloaded += len(block)
+            if total is None or os.path.getsize(part_path) >= total:
+                break
+            print(f"⚠️ Descarga incompleta de {url} ({os.path.getsize(part_path)}/{total} bytes), reanudando…")
+        except SourceNotFound:
+            raise
+        except requests.RequestException as e:
+            print(f"⚠️ Error en intento {attempt}/{retries} al descargar {url}: {e}")
+            if attempt == retries:
+                raise
+            time.sleep(delay * attempt)
+    else:
+        raise IOError(f"Descarga incompleta de {url} tras {retries} intentos")
+
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        os.remove(part_path)
+        raise IOError(f"Tamaño inesperado para {url}: {size} != {total}")
+    if validate is not None and not validate(part_path):
+        os.remove(part_path)
+        raise IOError(f"Archivo descargado inválido: {url}")
+    os.replace(part_path, local_path)
+
+    elapsed = time.time() - start
+    return {
+        "path": local_path,
+        "bytes": size,
+        "bytes_downloaded": downloaded,
+        "seconds": elapsed,
+        "bytes_per_sec": downloaded / elapsed if elapsed > 0 else None,
+        "etag": etag,
+        "last_modified": last_modified,
+        "cached": False,
+    }
+
+
+def ensure_local_file(url, local_path, *, validate=is_valid_parquet, remote=None, **kwargs):
+    """
+    Devuelve el archivo local si está en la caché de fuentes y sigue íntegro; si
+    no, lo (re)descarga y lo registra (ver utils.source_cache: cuota, LRU, pins).
+    Un archivo truncado de una corrida anterior se descarta en vez de usarse.
+    remote es la huella del HEAD actual (utils.fingerprints): si la copia local
+    se bajó con otro ETag / tamaño, la fuente cambió y se vuelve a descargar.
+    """
+    cache = get_source_cache()
+    if cache.lookup(local_path, url, validate=validate, remote=remote):
+        return {"path": local_path, "bytes": os.path.getsize(local_path),
+                "bytes_downloaded": 0, "seconds": 0.0, "bytes_per_sec": None,
+                "cached": True}
+
+    cache.reserve(local_path)
+    print(f"Descargando {url} …")
+    with span("download", file=os.path.basename(local_path)) as sp:
+        res = download_file(url, local_path, validate=validate, **kwargs)
+        sp["bytes"] = res["bytes_downloaded"]
+    remote = remote or {}
+    cache.record(local_path, url, {"etag": res["etag"] or remote.get("etag"),
+                                   "last_modified": res["last_modified"] or remote.get("last_modified")})
+    if res["bytes_per_sec"]:
+        print(f"⬇️ {res['bytes'] / 1e6:.1f} MB en {res['seconds']:.1f}s "
+              f"({res['bytes_per_sec'] / 1e6:.1f} MB/s)")
+    return res
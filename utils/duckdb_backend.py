@@ -0,0 +1,348 @@
+# backend DuckDB embebido (WAREHOUSE_BACKEND=duckdb, ver utils.warehouse)
+#
+# Una base DuckDB local (DUCKDB_PATH) con los schemas BRONZE / RAW / SILVER y las
+# tablas destino de los loaders. Expone la misma superficie que el pool de
+# Snowflake (cursor.execute con %s, fetchone, fetchall, rowcount) y traduce el
+# subconjunto de SQL de Snowflake que emiten los loaders:
+# - CREATE FILE FORMAT / CREATE STAGE no hacen nada
+# - PUT solo registra la ruta local: el COPY lee el Parquet de data/nyc_tlc
+#   (o de prepared/) directamente, sin stage
+# - COPY INTO de la tabla VARIANT con CHUNK_ID crea una tabla temporal con las
+#   columnas del Parquet (v:col se resuelve a la columna, o NULL si no existe)
+# - COPY INTO tipado ($1:"col"::TIPO) pasa a INSERT ... SELECT sobre read_parquet
+# - COPY con FILES = (...) (upload_mode='parts') lee la lista de partes y el
+#   CHUNK_ID sale de __row_number
+# - COPY INTO con FILE_FORMAT CSV (taxi zones) pasa a INSERT ... SELECT sobre read_csv
+# - los SELECT se leen recién al primer fetch; fetch_arrow_batches los devuelve
+#   como tablas de Arrow por lotes (igual que el conector de Snowflake)
+# - TRY_TO_NUMBER / TO_TIMESTAMP_NTZ son macros; TRY_TO_DECIMAL(x, p, s) se
+#   reescribe al traducir a TRY_CAST(... AS DECIMAL(p, s)) con la precisión y
+#   escala de cada llamada (una macro no puede parametrizar el tipo)
+# - tipos NUMBER / STRING / TIMESTAMP_NTZ / VARIANT en el DDL; TRANSIENT y
+#   CLUSTER BY se ignoran (DuckDB no tiene clustering keys), ALTER SESSION no hace nada
+# Lo usan el desarrollo local, chequeos tipo CI y benchmarks/ (no replica los
+# costos de Snowflake, sirve para comparar versiones del código entre sí).
+
+import os
+import re
+import threading
+import duckdb
+import pyarrow as pa
+
+DEFAULT_PATH = "data/warehouse/NYC_TAXI.duckdb"
+LOCAL_DATA_DIR = "data/nyc_tlc"
+ARROW_BATCH_ROWS = 1_000_000
+
+_lock = threading.Lock()
+_warehouse = None
+
+MACROS = [
+    "CREATE OR REPLACE MACRO TRY_TO_NUMBER(x) AS TRY_CAST(x AS BIGINT)",
+    "CREATE OR REPLACE MACRO TO_TIMESTAMP_NTZ(x) AS CAST(x AS TIMESTAMP)",
+]
+
+AUDIT_DDL = """(
+    RUN_ID STRING, SERVICE STRING, YEAR NUMBER, MONTH NUMBER, SOURCE_FILE STRING,
+    CHUNK_INDEX NUMBER, CHUNK_SIZE NUMBER, ROWS_IN_FILE NUMBER, ROWS_INSERTED NUMBER,
+    STATUS STRING, ERROR_MESSAGE STRING{extra})"""
+
+SILVER_DDL = """(
+    VENDOR_ID NUMBER, PICKUP_DATETIME TIMESTAMP_NTZ, DROPOFF_DATETIME TIMESTAMP_NTZ,
+    PASSENGER_COUNT NUMBER, TRIP_DISTANCE NUMBER(12,3), RATECODE_ID NUMBER,
+    STORE_AND_FWD_FLAG STRING, PULOCATION_ID NUMBER, DOLOCATION_ID NUMBER,
+    PAYMENT_TYPE_ID NUMBER, PAYMENT_TYPE STRING, FARE_AMOUNT NUMBER(12,2), EXTRA NUMBER(12,2),
+    MTA_TAX NUMBER(12,2), TIP_AMOUNT NUMBER(12,2), TOLLS_AMOUNT NUMBER(12,2),
+    IMPROVEMENT_SURCHARGE NUMBER(12,2), TOTAL_AMOUNT NUMBER(12,2),
+    CONGESTION_SURCHARGE NUMBER(12,2), AIRPORT_FEE NUMBER(12,2), CBD_CONGESTION_FEE NUMBER(12,2),
+    EHAIL_FEE NUMBER(12,2), TRIP_TYPE NUMBER, SERVICE_TYPE STRING, SOURCE_FILE STRING,
+    LOAD_TS TIMESTAMP_NTZ, PU_BOROUGH STRING, PU_ZONE STRING, PU_SERVICE_ZONE STRING,
+    DO_BOROUGH STRING, DO_ZONE STRING, DO_SERVICE_ZONE STRING)"""
+
+
+def snowflake_types(sql):
+    """
+    Tipos de Snowflake del DDL a tipos DuckDB.
+    """
+    sql = re.sub(r"\bTIMESTAMP_NTZ\b", "TIMESTAMP", sql, flags=re.I)
+    sql = re.sub(r"\bSTRING\b", "VARCHAR", sql, flags=re.I)
+    sql = re.sub(r"\bNUMBER\s*\((\d+)\s*,\s*(\d+)\)", r"DECIMAL(\1,\2)", sql, flags=re.I)
+    sql = re.sub(r"\bNUMBER\b", "BIGINT", sql, flags=re.I)
+    sql = re.sub(r"\bVARIANT\b", "JSON", sql, flags=re.I)
+    return sql
+
+
+def bronze_ddl(spec):
+    cols = ",\n    ".join(f"{target} {sf_type}" for target, _, sf_type, _ in spec)
+    return f"(\n    {cols},\n    SOURCE_FILE STRING)"
+
+
+class DuckWarehouse:
+    """
+    Base DuckDB con los schemas y tablas destino de los loaders. El nombre del
+    archivo (sin extensión) es el "database" que ven los loaders.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        from utils.typed_copy import GREEN_BRONZE_SPEC, YELLOW_BRONZE_SPEC
+
+        self.path = os.path.abspath(path)
+        self.database = os.path.splitext(os.path.basename(self.path))[0]
+        self.staged = {}           # (stage, archivo) -> ruta local del PUT
+        self.variant_tables = {}   # tabla temporal -> {columna en minúsculas: nombre real}
+        self.shared_staging = set()  # staging TRANSIENT: tabla común para los chunks en vuelo
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = duckdb.connect(self.path)
+
+        cur = DuckCursor(self, self.db.cursor())
+        for macro in MACROS:
+            cur.execute(macro)
+        for schema in ("BRONZE", "RAW", "SILVER"):
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        ref = self.database
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {ref}.BRONZE.YELLOW_TRIPS {bronze_ddl(YELLOW_BRONZE_SPEC)}")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {ref}.RAW.GREEN_TRIPS {bronze_ddl(GREEN_BRONZE_SPEC)}")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {ref}.BRONZE.INGEST_AUDIT {AUDIT_DDL.format(extra='')}")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {ref}.RAW.GREEN_TRIPS_METADATA "
+                    f"{AUDIT_DDL.format(extra=', INGEST_TS TIMESTAMP_NTZ')}")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {ref}.SILVER.TAXI_TRIPS_ALL {SILVER_DDL}")
+        cur.close()
+
+    # ---- misma interfaz que utils.snowflake_pool ----
+    def acquire_connection(self, schema=None, default_schema="BRONZE"):
+        return DuckConnection(self), self.database, schema or default_schema
+
+    def release_connection(self, conn):
+        conn.close()
+
+    def local_file(self, stage_ref, fname):
+        """
+        Archivo local que corresponde a @stage/fname: el del último PUT o, si el
+        PUT lo hizo otro proceso, el de data/nyc_tlc.
+        """
+        path = self.staged.get((stage_ref.upper(), fname))
+        return path or os.path.abspath(os.path.join(LOCAL_DATA_DIR, fname))
+
+    def close(self):
+        self.db.close()
+
+
+def get_warehouse():
+    """
+    Base DuckDB del proceso (se abre la primera vez, en DUCKDB_PATH).
+    """
+    global _warehouse
+    with _lock:
+        if _warehouse is None:
+            _warehouse = DuckWarehouse(os.environ.get("DUCKDB_PATH") or DEFAULT_PATH)
+        return _warehouse
+
+
+def shutdown():
+    """
+    Cierra la base del proceso (checkpoint del archivo DuckDB).
+    """
+    global _warehouse
+    with _lock:
+        if _warehouse is not None:
+            _warehouse.close()
+            _warehouse = None
+
+
+def _split_args(text):
+    """
+    Argumentos de una llamada separados por las comas de primer nivel.
+    """
+    args, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+
+def try_to_decimal(sql):
+    """
+    TRY_TO_DECIMAL(x, p, s) → TRY_CAST(round(TRY_CAST(x AS DOUBLE), s) AS DECIMAL(p, s)),
+    con paréntesis anidados en x (COALESCE(...)).
+    """
+    out, pos = [], 0
+    for m in re.finditer(r"\bTRY_TO_DECIMAL\s*\(", sql, re.I):
+        if m.start() < pos:
+            continue
+        depth, end = 1, m.end()
+        while depth and end < len(sql):
+            depth += {"(": 1, ")": -1}.get(sql[end], 0)
+            end += 1
+        args = _split_args(try_to_decimal(sql[m.end():end - 1]))
+        if len(args) != 3:
+            raise ValueError(f"TRY_TO_DECIMAL sin precisión y escala: {sql[m.start():end]}")
+        x, p, sc = args
+        out.append(sql[pos:m.start()])
+        out.append(f"TRY_CAST(round(TRY_CAST({x} AS DOUBLE), {sc}) AS DECIMAL({p}, {sc}))")
+        pos = end
+    out.append(sql[pos:])
+    return "".join(out)
+
+
+class DuckConnection:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self._closed = False
+
+    def cursor(self):
+        cur = DuckCursor(self.warehouse, self.warehouse.db.cursor())
+        cur.connection = self
+        return cur
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class DuckCursor:
+    def __init__(self, warehouse, con):
+        self.wh = warehouse
+        self.con = con
+        self.rowcount = None
+        self._rows = []
+
+    def close(self):
+        self.con.close()
+
+    def _materialize(self):
+        if self._rows is None:
+            self._rows = self.con.fetchall()
+            self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        self._materialize()
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        self._materialize()
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetch_arrow_batches(self, batch_rows=ARROW_BATCH_ROWS):
+        """
+        Como en el conector de Snowflake: el resultado pendiente en tablas de
+        Arrow de a batch_rows filas, sin pasar por tuplas de Python.
+        """
+        if self._rows is not None:
+            raise RuntimeError("fetch_arrow_batches necesita un SELECT sin leer")
+        self._rows = []
+        for batch in self.con.fetch_record_batch(batch_rows):
+            yield pa.Table.from_batches([batch])
+
+    # ---- traducción ----
+    def execute(self, sql, params=None):
+        text = sql.strip()
+        head = " ".join(text.split()[:4]).upper()
+        self.rowcount, self._rows = None, []
+
+        if head.startswith(("CREATE FILE FORMAT", "CREATE STAGE", "ALTER SESSION")):
+            return self
+        if head.startswith("PUT "):
+            return self._put(text)
+        m = re.match(r"CREATE OR REPLACE (TEMP|TRANSIENT) TABLE (\S+) \(\s*V\s+VARIANT\b", text, re.I)
+        if m:
+            # se crea en el COPY, con las columnas del Parquet
+            if m.group(1).upper() == "TRANSIENT":
+                self.wh.shared_staging.add(m.group(2).upper())
+            else:
+                self.wh.shared_staging.discard(m.group(2).upper())
+            return self
+        if head.startswith("COPY INTO"):
+            return self._copy(text)
+        m = re.match(r"CREATE OR REPLACE TRANSIENT TABLE (\S+) LIKE (\S+)", text, re.I)
+        if m:
+            return self._run(f"CREATE OR REPLACE TABLE {m.group(1)} AS SELECT * FROM {m.group(2)} LIMIT 0")
+        if head.startswith("BEGIN"):
+            return self._run("BEGIN TRANSACTION")
+        return self._run(self._translate(text), params)
+
+    def _translate(self, sql):
+        if re.match(r"\s*(CREATE|ALTER)\b", sql, re.I):
+            sql = snowflake_types(sql)
+            sql = re.sub(r"\bTRANSIENT\s+", "", sql, flags=re.I)
+            sql = re.sub(r"\bCLUSTER BY\s*\((?:[^()]|\([^()]*\))*\)", "", sql, flags=re.I)
+        sql = re.sub(r"CURRENT_TIMESTAMP\(\)", "CURRENT_TIMESTAMP", sql, flags=re.I)
+        sql = try_to_decimal(sql)
+        for table, columns in self.wh.variant_tables.items():
+            if re.search(rf"\b{re.escape(table)}\b", sql, re.I):
+                sql = re.sub(r'\bv:"?(\w+)"?(?:::string)?',
+                             lambda m: f'"{columns[m.group(1).lower()]}"'
+                             if m.group(1).lower() in columns else "NULL",
+                             sql)
+        return sql.replace("%s", "?")
+
+    def _run(self, sql, params=None):
+        self.con.execute(sql, params or [])
+        if re.match(r"\s*(INSERT|DELETE|UPDATE)\b", sql, re.I):
+            self.rowcount = self.con.fetchone()[0]
+        elif self.con.description:
+            self._rows = None  # se lee al primer fetch (fetchall o fetch_arrow_batches)
+            self.rowcount = -1
+        return self
+
+    def _put(self, sql):
+        m = re.match(r"PUT file://(\S+) @(\S+)", sql, re.I)
+        src, stage_ref = m.group(1), m.group(2)
+        self.wh.staged[(stage_ref.upper(), os.path.basename(src))] = src
+        self.rowcount = 1
+        return self
+
+    def _copy(self, sql):
+        target = re.match(r"COPY INTO\s+([\w.$]+)", sql, re.I).group(1)
+        files = re.search(r"FILES\s*=\s*\(([^)]*)\)", sql, re.I)
+        if files:
+            stage_ref = re.search(r"FROM\s+@([^/\s)]+)", sql, re.I).group(1)
+            fnames = re.findall(r"'([^']+)'", files.group(1))
+            fname = fnames[0]
+            paths = [self.wh.local_file(stage_ref, f).replace("'", "''") for f in fnames]
+            source = "[" + ", ".join(f"'{p}'" for p in paths) + "]"
+        else:
+            m = re.search(r"FROM\s+@([^/\s]+)/(\S+)", sql, re.I)
+            fname = m.group(2).rstrip(")")
+            path = self.wh.local_file(m.group(1), fname).replace("'", "''")
+            source = f"'{path}'"
+
+        chunk = re.search(r"METADATA\$FILE_ROW_NUMBER\s*-\s*1\)\s*/\s*(\d+)", sql, re.I)
+        part_chunk = re.search(r'\$1:"__row_number"::NUMBER\s*/\s*(\d+)', sql, re.I)
+        if re.search(r"TYPE\s*=\s*CSV", sql, re.I):
+            cols = re.search(r"COPY INTO\s+\S+\s*\(([^)]*)\)", sql, re.I).group(1)
+            self.con.execute(f"INSERT INTO {target} ({cols}) SELECT * FROM read_csv({source}, header=true)")
+            loaded = self.con.fetchone()[0]
+        elif chunk or part_chunk:
+            # tabla VARIANT con CHUNK_ID: columnas del Parquet + CHUNK_ID
+            if part_chunk:
+                select = f'*, ("__row_number" // {int(part_chunk.group(1))}) + 1 AS CHUNK_ID'
+                scan = f"read_parquet({source})"
+            else:
+                select = f"* EXCLUDE (file_row_number), (file_row_number // {int(chunk.group(1))}) + 1 AS CHUNK_ID"
+                scan = f"read_parquet({source}, file_row_number=true)"
+            kind = "TABLE" if target.upper() in self.wh.shared_staging else "TEMP TABLE"
+            self.con.execute(f"CREATE OR REPLACE {kind} {target} AS SELECT {select} FROM {scan}")
+            names = [r[0] for r in self.con.execute(f"DESCRIBE {target}").fetchall()]
+            self.wh.variant_tables[target.upper()] = {n.lower(): n for n in names if n != "CHUNK_ID"}
+            loaded = self.con.execute(f"SELECT COUNT(*) FROM {target}").fetchone()[0]
+        else:
+            # COPY tipado: $1:"col"::TIPO → CAST("col" AS TIPO)
+            cols = re.search(r"COPY INTO\s+\S+\s*\(([^)]*)\)", sql, re.I).group(1)
+            select = re.search(r"SELECT\s+(.*?)\s+FROM\s+@", sql, re.I | re.S).group(1)
+            select = re.sub(r'\$1:"([^"]+)"::(\w+(?:\(\d+,\s*\d+\))?)',
+                            lambda x: f'CAST("{x.group(1)}" AS {snowflake_types(x.group(2))})', select)
+            select = re.sub(r"SPLIT_PART\(METADATA\$FILENAME,\s*'/',\s*-1\)", f"'{fname}'", select)
+            self.con.execute(f"INSERT INTO {target} ({cols}) SELECT {select} FROM read_parquet({source})")
+            loaded = self.con.fetchone()[0]
+
+        self._rows = [(fname, "LOADED", loaded, loaded)]
+        self.rowcount = 1
+        return self
@@ -0,0 +1,166 @@
+# huellas de los archivos fuente para no recargar meses que no cambiaron
+#
+# Por cada carga exitosa se guarda en <schema>.SOURCE_FINGERPRINTS el ETag /
+# Last-Modified / tamaño del HEAD, las filas del Parquet y un sha256 del contenido.
+# En la siguiente corrida, si el HEAD coincide con la huella guardada, el mes se
+# omite (salvo force=True). La huella se borra antes de recargar un mes, así un
+# fallo a mitad de carga nunca deja una huella "OK" sobre datos incompletos.
+# Si el HEAD cambió, la copia local de la caché de fuentes se descarta (se pasa
+# el HEAD a ensure_local_file) y record_fingerprint se niega a guardar una
+# huella remota que no corresponde al archivo que se cargó.
+
+import hashlib
+import os
+import requests
+import pyarrow.parquet as pq
+from utils.snowflake_pool import bootstrap_once
+from utils.source_cache import get_source_cache
+from utils.warehouse import acquire_connection, release_connection
+
+FINGERPRINT_TABLE = "SOURCE_FINGERPRINTS"
+HASH_BLOCK = 8 * 1024 * 1024
+
+
+def ensure_fingerprint_table(cur, schema_ref):
+    bootstrap_once(cur, f"{schema_ref}.{FINGERPRINT_TABLE}", f"""
+        CREATE TABLE IF NOT EXISTS {schema_ref}.{FINGERPRINT_TABLE} (
+            TARGET_TABLE    STRING,
+            SOURCE_FILE     STRING,
+            SERVICE         STRING,
+            ETAG            STRING,
+            LAST_MODIFIED   STRING,
+            BYTES           NUMBER,
+            ROWS_IN_FILE    NUMBER,
+            CONTENT_SHA256  STRING,
+            LOADED_TS       TIMESTAMP_NTZ
+        )
+    """)
+
+
+def remote_fingerprint(url, timeout=60):
+    """
+    ETag / Last-Modified / Content-Length de un HEAD; None si la fuente da 404.
+    """
+    r = requests.head(url, timeout=timeout, allow_redirects=True)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    length = r.headers.get("Content-Length")
+    return {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "bytes": int(length) if length and length.isdigit() else None,
+    }
+
+
+def local_fingerprint(path):
+    """
+    Tamaño, filas (footer Parquet) y sha256 del archivo local, leído en bloques,
+    más el ETag / Last-Modified con que lo bajó la caché de fuentes.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            sha.update(block)
+    return {
+        "bytes": os.path.getsize(path),
+        "rows_in_file": pq.ParquetFile(path).metadata.num_rows,
+        "sha256": sha.hexdigest(),
+        **{f"source_{k}": v for k, v in get_source_cache().remote_of(path).items()},
+    }
+
+
+def stored_fingerprint(cur, schema_ref, target_table, fname):
+    cur.execute(f"""
+        SELECT ETAG, LAST_MODIFIED, BYTES, ROWS_IN_FILE, CONTENT_SHA256
+        FROM {schema_ref}.{FINGERPRINT_TABLE}
+        WHERE TARGET_TABLE = %s AND SOURCE_FILE = %s
+        ORDER BY LOADED_TS DESC
+        LIMIT 1
+    """, (target_table, fname))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return {"etag": row[0], "last_modified": row[1], "bytes": row[2],
+            "rows_in_file": row[3], "sha256": row[4]}
+
+
+def is_unchanged(remote, stored):
+    """
+    True si la huella remota coincide con la guardada. Se prefiere el ETag; sin
+    ETag se exige Last-Modified y tamaño iguales.
+    """
+    if remote is None or stored is None:
+        return False
+    if remote["etag"] and stored["etag"]:
+        return remote["etag"] == stored["etag"]
+    return (remote["last_modified"] is not None
+            and remote["last_modified"] == stored["last_modified"]
+            and remote["bytes"] == stored["bytes"])
+
+
+def matches_local(remote, local):
+    """
+    True si la huella remota corresponde al archivo cargado: mismo ETag que el
+    de su descarga o, sin ETag para comparar, mismo tamaño que el Content-Length.
+    """
+    if remote is None:
+        return True
+    if remote.get("etag") and local.get("source_etag"):
+        return remote["etag"] == local["source_etag"]
+    if remote.get("bytes") is None:
+        return bool(remote.get("last_modified")) and remote["last_modified"] == local.get("source_last_modified")
+    return remote["bytes"] == local["bytes"]
+
+
+def check_unchanged(cur, schema_ref, target_table, fname, url):
+    """
+    Devuelve (sin_cambios, huella_remota, huella_guardada).
+    """
+    ensure_fingerprint_table(cur, schema_ref)
+    remote = remote_fingerprint(url)
+    stored = stored_fingerprint(cur, schema_ref, target_table, fname)
+    return is_unchanged(remote, stored), remote, stored
+
+
+def source_unchanged(url, fname, target_table, **conn_kwargs):
+    """
+    Igual que check_unchanged pero con su propia sesión del pool; lo usan las
+    etapas del modo pipeline para no descargar meses que se van a omitir.
+    Devuelve (sin_cambios, huella_remota).
+    """
+    conn, sf_database, sf_schema = acquire_connection(**conn_kwargs)
+    cur = conn.cursor()
+    try:
+        return check_unchanged(cur, f"{sf_database}.{sf_schema}", target_table, fname, url)[:2]
+    finally:
+        cur.close()
+        release_connection(conn)
+
+
+def invalidate_fingerprint(cur, schema_ref, target_table, fname):
+    ensure_fingerprint_table(cur, schema_ref)
+    cur.execute(f"DELETE FROM {schema_ref}.{FINGERPRINT_TABLE} WHERE TARGET_TABLE = %s AND SOURCE_FILE = %s",
+                (target_table, fname))
+
+
+def record_fingerprint(cur, schema_ref, target_table, fname, service, remote, local):
+    """
+    Guarda la huella de una carga exitosa (reemplaza la anterior del mismo
+    archivo). Si la huella remota no corresponde al archivo cargado (la fuente
+    cambió después de bajarlo) no se guarda nada y devuelve False: la próxima
+    corrida ve el cambio y vuelve a bajar y cargar el mes.
+    """
+    invalidate_fingerprint(cur, schema_ref, target_table, fname)
+    if not matches_local(remote, local):
+        print(f"⚠️ {fname}: la fuente ya no coincide con el archivo cargado (ETag / tamaño), "
+              f"no se guarda la huella y la próxima corrida lo recarga")
+        return False
+    remote = remote or {"etag": None, "last_modified": None}
+    cur.execute(f"""
+        INSERT INTO {schema_ref}.{FINGERPRINT_TABLE}
+        (TARGET_TABLE,SOURCE_FILE,SERVICE,ETAG,LAST_MODIFIED,BYTES,ROWS_IN_FILE,CONTENT_SHA256,LOADED_TS)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP())
+    """, (target_table, fname, service, remote["etag"], remote["last_modified"],
+          local["bytes"], local["rows_in_file"], local["sha256"]))
+    return True
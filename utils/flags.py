@@ -0,0 +1,12 @@
+# variables de pipeline booleanas
+#
+# Mage pasa las variables del pipeline como texto: bool('False') es True, así que
+# los flags se leen siempre con parse_flag y nunca con bool(...).
+
+
+def parse_flag(value):
+    """
+    True solo para True / 'true' / '1' / 'yes' (sin importar mayúsculas ni
+    espacios); cualquier otro valor, incluido None, es False.
+    """
+    return str(value).strip().lower() in ('true', '1', 'yes')
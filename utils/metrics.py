@@ -0,0 +1,87 @@
+# spans de tiempo por etapa de los loaders (métricas locales en JSON-lines)
+#
+# Cada etapa (secrets, connect, download, parquet_open, put, copy, delete,
+# chunk_insert, audit_write, ...) se envuelve en span(): al salir se agrega una
+# línea a METRICS_PATH con la duración, filas, bytes, filas/s y bytes/s, más las
+# etiquetas del mes que se está cargando (servicio, año, mes, archivo).
+# Las etiquetas se fijan con set_tags() y valen para el hilo actual, así cada
+# worker del backfill etiqueta sus propios spans.
+# collect_spans() además junta en memoria los spans de todos los hilos mientras
+# dura el bloque (lo usa utils.run_results para los tiempos por etapa de cada mes).
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_PATH = "data/metrics/ingest_spans.jsonl"
+
+_tags = contextvars.ContextVar("metric_tags", default={})
+_write_lock = threading.Lock()
+_collectors = []
+
+
+def set_tags(**tags):
+    """
+    Etiquetas que se agregan a todos los spans siguientes del hilo actual.
+    """
+    _tags.set(dict(tags))
+
+
+def write_span(record, path=None):
+    with _write_lock:
+        for spans in _collectors:
+            spans.append(record)
+    path = path or METRICS_PATH
+    if not path:
+        return
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def collect_spans():
+    """
+    Lista con los spans que se escriban (desde cualquier hilo) dentro del bloque.
+    """
+    spans = []
+    with _write_lock:
+        _collectors.append(spans)
+    try:
+        yield spans
+    finally:
+        with _write_lock:
+            _collectors.remove(spans)
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Mide el bloque y escribe el span al salir (también si falla, con status ERROR).
+    El bloque puede completar rows / bytes en el dict que devuelve.
+    """
+    record = {"stage": stage, **_tags.get(), **fields,
+              "start_ts": datetime.utcnow().isoformat(timespec="milliseconds")}
+    start = time.perf_counter()
+    try:
+        yield record
+        record.setdefault("status", "OK")
+    except BaseException as e:
+        record["status"] = "ERROR"
+        record["error"] = str(e)[:500]
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        record["elapsed_sec"] = round(elapsed, 4)
+        if elapsed > 0:
+            if record.get("rows") is not None:
+                record["rows_per_sec"] = round(record["rows"] / elapsed, 1)
+            if record.get("bytes") is not None:
+                record["bytes_per_sec"] = round(record["bytes"] / elapsed, 1)
+        write_span(record)
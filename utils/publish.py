@@ -0,0 +1,48 @@
+# publicación atómica de un mes (modo publish_mode="swap")
+#
+# El mes se construye en una tabla lateral TRANSIENT (misma estructura que la
+# final) y se publica en una sola transacción: DELETE del SOURCE_FILE + INSERT
+# desde la lateral. Los lectores ven el mes viejo o el nuevo completo, nunca uno
+# a medias, y si la carga falla antes de publicar la tabla final no se toca.
+# Como cada mes llega en sus propias micro-particiones, el DELETE por SOURCE_FILE
+# poda al mes y el costo escala con el tamaño del mes, no de la tabla.
+
+from utils.metrics import span
+
+
+def side_table_name(table_name, year, month, service):
+    """
+    Lateral de un mes de un servicio: silver recibe yellow y green en la misma
+    tabla, y dos cargas del mismo mes pueden correr a la vez.
+    """
+    return f"{table_name}__LOAD_{service.upper()}_{year}{month:02d}"
+
+
+def create_side_table(cur, schema_ref, table_name, side_table):
+    """
+    Tabla lateral vacía con la misma estructura que la tabla final.
+    """
+    cur.execute(f"CREATE OR REPLACE TRANSIENT TABLE {schema_ref}.{side_table} "
+                f"LIKE {schema_ref}.{table_name}")
+
+
+def publish_month(cur, schema_ref, table_name, side_table, fname):
+    """
+    Reemplaza las filas de fname en la tabla final por las de la lateral en una
+    transacción y borra la lateral. Devuelve las filas publicadas.
+    """
+    target = f"{schema_ref}.{table_name}"
+    side = f"{schema_ref}.{side_table}"
+    print(f"Publicando {fname} en {target} (transacción única)…")
+    with span("publish", file=fname) as sp:
+        cur.execute("BEGIN")
+        try:
+            cur.execute(f"DELETE FROM {target} WHERE SOURCE_FILE = %s", (fname,))
+            cur.execute(f"INSERT INTO {target} SELECT * FROM {side}")
+            sp["rows"] = published = cur.rowcount
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    cur.execute(f"DROP TABLE IF EXISTS {side}")
+    return published
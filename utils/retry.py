@@ -0,0 +1,72 @@
+# reintentos de operaciones contra el warehouse
+#
+# - backoff exponencial con jitter completo (sleep al azar entre 0 y
+#   base * 2^(intento-1), con tope), así los workers de un backfill que fallan
+#   juntos no reintentan todos en el mismo segundo
+# - los errores se clasifican: los transitorios (red, timeouts, sesión vencida,
+#   throttling, locks) se reintentan; los fatales (SQL inválido, objeto
+#   inexistente, conversión de datos) se propagan enseguida, reintentarlos solo
+#   demora el error
+
+import random
+import time
+
+# errno de Snowflake que vale la pena reintentar
+TRANSIENT_ERRNOS = {
+    604,      # SQL execution canceled
+    625,      # demasiados statements esperando el lock
+    630,      # timeout de statement / warehouse
+    390114,   # token de sesión vencido
+    250001,   # no se pudo conectar al backend
+    250003,   # sin respuesta del backend
+}
+TRANSIENT_MARKERS = ("timeout", "timed out", "connection reset", "connection aborted",
+                     "could not connect", "temporarily unavailable", "service unavailable",
+                     "too many requests", "throttl", "429", "502", "503", "504")
+FATAL_CLASSES = ("ProgrammingError", "DataError", "IntegrityError", "NotSupportedError")
+
+
+def is_transient(exc):
+    """
+    True si vale la pena reintentar exc. Mira el errno y la clase del error del
+    conector (sin importarlo) y, si no alcanza, el mensaje.
+    """
+    if getattr(exc, "errno", None) in TRANSIENT_ERRNOS:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & set(FATAL_CLASSES):
+        return False
+    if names & {"OperationalError", "InterfaceError"}:
+        return True
+    msg = str(exc).lower()
+    return any(marker in msg for marker in TRANSIENT_MARKERS)
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """
+    Segundos a esperar antes del reintento número attempt (1 = primer reintento).
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def run_with_retries(fn, *, retries=3, label="operación", base_delay=2.0, max_delay=60.0):
+    """
+    Ejecuta fn(attempt) hasta retries veces. Los errores fatales y el último
+    transitorio se propagan.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            return fn(attempt)
+        except Exception as e:
+            if not is_transient(e):
+                print(f"❌ Error no recuperable en {label}: {e}")
+                raise
+            if attempt >= retries:
+                print(f"❌ Error definitivo en {label} tras {retries} intentos: {e}")
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"⚠️ Error transitorio en {label} intento {attempt}/{retries}: {e}, "
+                  f"reintentando en {delay:.1f}s…")
+            time.sleep(delay)
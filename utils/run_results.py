@@ -0,0 +1,109 @@
+# resultados de un backfill como un único Parquet en vez de un dict por mes
+#
+# Si el bloque devuelve la lista de resultados, Mage guarda cada elemento como
+# una variable aparte (output_N/ con data.json, sample_data.json, type.json y
+# resource_usage.json) y cada corrida deja cientos de directorios en .variables/.
+# Acá los resultados por mes (estado, filas, error y segundos por etapa sacados
+# de los spans de utils.metrics) se escriben en una sola tabla en
+# data/run_results/<bloque>/<run_id>.parquet y el bloque devuelve solo un
+# resumen chico con la ruta del artefacto.
+
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RESULTS_DIR = "data/run_results"
+BASE_COLUMNS = ["year", "month", "status", "file", "rows_in_file", "rows_inserted", "error"]
+MAX_ERRORS_IN_SUMMARY = 5
+
+
+def stage_seconds(spans):
+    """
+    {(año, mes): {etapa: segundos}} sumando los spans etiquetados con año y mes.
+    """
+    by_month = defaultdict(lambda: defaultdict(float))
+    for sp in spans:
+        if sp.get("year") is None or sp.get("month") is None:
+            continue
+        by_month[(int(sp["year"]), int(sp["month"]))][sp["stage"]] += sp.get("elapsed_sec") or 0.0
+    return by_month
+
+
+def _scalar(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return json.dumps(value, default=str)
+
+
+def results_table(results, spans=()):
+    """
+    Tabla con una fila por mes: columnas base, los campos extra que devuelva el
+    loader y <etapa>_sec por cada etapa medida.
+    """
+    timings = stage_seconds(spans)
+    stages = sorted({stage for per_stage in timings.values() for stage in per_stage})
+    extra = []
+    for res in results:
+        extra += [k for k in res if k not in BASE_COLUMNS and k not in extra]
+
+    rows = []
+    for res in results:
+        row = {col: _scalar(res.get(col)) for col in BASE_COLUMNS + extra}
+        per_stage = timings.get((res["year"], res["month"]), {})
+        row.update({f"{stage}_sec": round(per_stage[stage], 4) if stage in per_stage else None
+                    for stage in stages})
+        rows.append(row)
+
+    fields = [pa.field("year", pa.int16()), pa.field("month", pa.int8()),
+              pa.field("status", pa.string()), pa.field("file", pa.string()),
+              pa.field("rows_in_file", pa.int64()), pa.field("rows_inserted", pa.int64()),
+              pa.field("error", pa.string())]
+    if rows and (extra or stages):
+        inferred = pa.Table.from_pylist(rows).schema
+        for name in extra + [f"{stage}_sec" for stage in stages]:
+            field = inferred.field(name)
+            if pa.types.is_null(field.type):
+                # columna sin ningún valor en esta corrida
+                field = pa.field(name, pa.float64() if name.endswith("_sec") else pa.string())
+            fields.append(field)
+    return pa.Table.from_pylist(rows, schema=pa.schema(fields))
+
+
+def summarize(results, run_id, artifact):
+    """
+    Resumen que devuelve el bloque: conteo por estado, totales de filas y los
+    primeros errores.
+    """
+    errors = [f"{r['year']}-{r['month']:02d}: {str(r.get('error'))[:200]}"
+              for r in results if r.get("status") == "ERROR"]
+    return {
+        "run_id": run_id,
+        "artifact": artifact,
+        "months": len(results),
+        "status_counts": dict(Counter(r.get("status") for r in results)),
+        "rows_in_file": sum(r.get("rows_in_file") or 0 for r in results),
+        "rows_inserted": sum(r.get("rows_inserted") or 0 for r in results),
+        "errors": errors[:MAX_ERRORS_IN_SUMMARY],
+    }
+
+
+def save_run_results(block, results, spans=(), out_dir=RESULTS_DIR):
+    """
+    Escribe los resultados de la corrida en <out_dir>/<block>/<run_id>.parquet
+    (atómico vía .part) y devuelve el resumen.
+    """
+    run_id = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+    dst_dir = os.path.join(out_dir, block)
+    os.makedirs(dst_dir, exist_ok=True)
+    artifact = os.path.join(dst_dir, f"{run_id}.parquet")
+    part_path = artifact + ".part"
+    pq.write_table(results_table(results, spans), part_path, compression="zstd")
+    os.replace(part_path, artifact)
+
+    summary = summarize(results, run_id, artifact)
+    counts = ", ".join(f"{k}={v}" for k, v in sorted(summary["status_counts"].items()))
+    print(f"📦 {summary['months']} meses ({counts}), {summary['rows_inserted']} filas → {artifact}")
+    return summary
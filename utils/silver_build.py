@@ -0,0 +1,170 @@
+# construcción de SILVER.TAXI_TRIPS_ALL desde bronze, dentro del warehouse
+#
+# En vez de descargar, subir y copiar otra vez el Parquet, el mes se deriva de
+# BRONZE.YELLOW_TRIPS / GREEN_TRIPS con un solo INSERT ... SELECT por SOURCE_FILE,
+# con el mismo mapeo de payment_type y las mismas reglas de calidad que los
+# loaders de silver. DELETE + INSERT van en una transacción, así el mes se
+# reemplaza completo o no se toca. Bronze ya tiene los tipos destino, no hace
+# falta TRY_TO_* sobre VARIANT. Las columnas de zona salen de SILVER.TAXI_ZONES
+# una sola vez, al construir el mes (el equivalente en el warehouse del gather
+# que hace utils.arrow_prep en la ruta por archivo).
+
+from utils.fingerprints import FINGERPRINT_TABLE, ensure_fingerprint_table, invalidate_fingerprint
+from utils.metrics import span
+from utils.taxi_zones import ZONE_COLUMNS, ZONE_EXPRS, ZONES_TABLE, ensure_zone_columns, ensure_zones_table, zone_joins
+from utils.warehouse import acquire_connection, release_connection
+
+SILVER_SCHEMA = "SILVER"
+SILVER_TABLE = "TAXI_TRIPS_ALL"
+BRONZE_TABLES = {"yellow": "YELLOW_TRIPS", "green": "GREEN_TRIPS"}
+
+PAYMENT_TYPE_CASE = """CASE {col}
+                WHEN 1 THEN 'Credit Card'
+                WHEN 2 THEN 'Cash'
+                WHEN 3 THEN 'No Charge'
+                WHEN 4 THEN 'Dispute'
+                WHEN 5 THEN 'Unknown'
+                WHEN 6 THEN 'Voided Trip'
+                ELSE 'Other'
+            END"""
+
+SILVER_COLUMNS = [
+    "VENDOR_ID", "PICKUP_DATETIME", "DROPOFF_DATETIME", "PASSENGER_COUNT",
+    "TRIP_DISTANCE", "RATECODE_ID", "STORE_AND_FWD_FLAG", "PULOCATION_ID", "DOLOCATION_ID",
+    "PAYMENT_TYPE_ID", "PAYMENT_TYPE", "FARE_AMOUNT", "EXTRA", "MTA_TAX", "TIP_AMOUNT",
+    "TOLLS_AMOUNT", "IMPROVEMENT_SURCHARGE", "TOTAL_AMOUNT", "CONGESTION_SURCHARGE",
+    "AIRPORT_FEE", "CBD_CONGESTION_FEE", "EHAIL_FEE", "TRIP_TYPE", "SERVICE_TYPE",
+    "SOURCE_FILE", "LOAD_TS",
+] + ZONE_COLUMNS
+
+# columna de LocationID de pickup / dropoff en cada tabla bronze
+LOCATION_COLS = {"yellow": ("PULOCATION_ID", "DOLOCATION_ID"), "green": ("PULOCATIONID", "DOLOCATIONID")}
+
+# expresión sobre la tabla bronze para cada columna de SILVER_COLUMNS
+SILVER_EXPRS = {
+    "yellow": [
+        "VENDOR_ID", "TPEP_PICKUP_DATETIME", "TPEP_DROPOFF_DATETIME", "NULLIF(PASSENGER_COUNT, 0)",
+        "TRIP_DISTANCE", "RATECODE_ID", "STORE_AND_FWD_FLAG", "PULOCATION_ID", "DOLOCATION_ID",
+        "PAYMENT_TYPE", PAYMENT_TYPE_CASE.format(col="PAYMENT_TYPE"), "FARE_AMOUNT", "EXTRA",
+        "MTA_TAX", "TIP_AMOUNT", "TOLLS_AMOUNT", "IMPROVEMENT_SURCHARGE", "TOTAL_AMOUNT",
+        "CONGESTION_SURCHARGE", "AIRPORT_FEE", "CBD_CONGESTION_FEE", "NULL", "NULL", "'yellow'",
+        "SOURCE_FILE", "CURRENT_TIMESTAMP()", *ZONE_EXPRS,
+    ],
+    "green": [
+        "VENDORID", "LPEP_PICKUP_DATETIME", "LPEP_DROPOFF_DATETIME", "NULLIF(PASSENGER_COUNT, 0)",
+        "TRIP_DISTANCE", "RATECODEID", "STORE_AND_FWD_FLAG", "PULOCATIONID", "DOLOCATIONID",
+        "PAYMENT_TYPE", PAYMENT_TYPE_CASE.format(col="PAYMENT_TYPE"), "FARE_AMOUNT", "EXTRA",
+        "MTA_TAX", "TIP_AMOUNT", "TOLLS_AMOUNT", "IMPROVEMENT_SURCHARGE", "TOTAL_AMOUNT",
+        "CONGESTION_SURCHARGE", "NULL", "CBD_CONGESTION_FEE", "EHAIL_FEE", "TRIP_TYPE", "'green'",
+        "SOURCE_FILE", "CURRENT_TIMESTAMP()", *ZONE_EXPRS,
+    ],
+}
+
+# reglas de calidad de load_yellow_to_silver / load_green_to_silver
+QUALITY_RULES = {
+    "yellow": """TPEP_PICKUP_DATETIME IS NOT NULL
+          AND TPEP_DROPOFF_DATETIME IS NOT NULL
+          AND TRIP_DISTANCE >= 0
+          AND TOTAL_AMOUNT >= 0
+          AND DATEDIFF('hour', TPEP_PICKUP_DATETIME, TPEP_DROPOFF_DATETIME) <= 24""",
+    "green": """LPEP_PICKUP_DATETIME IS NOT NULL
+          AND LPEP_DROPOFF_DATETIME IS NOT NULL
+          AND TRIP_DISTANCE >= 0
+          AND TOTAL_AMOUNT >= 0""",
+}
+
+
+def silver_insert_sql(service, bronze_ref, silver_ref, zones_ref):
+    """
+    INSERT ... SELECT set-based de un SOURCE_FILE (parámetro %s) de bronze a silver,
+    con las zonas de pickup/dropoff de zones_ref.
+    """
+    exprs = ",\n            ".join(SILVER_EXPRS[service])
+    pu_col, do_col = LOCATION_COLS[service]
+    return f"""
+        INSERT INTO {silver_ref}
+        ({", ".join(SILVER_COLUMNS)})
+        SELECT
+            {exprs}
+        FROM {bronze_ref}
+        {zone_joins(zones_ref, pu_col, do_col)}
+        WHERE SOURCE_FILE = %s
+          AND {QUALITY_RULES[service]}
+    """
+
+
+def copy_fingerprint(cur, bronze_schema_ref, silver_schema_ref, bronze_table, fname):
+    """
+    La huella de silver pasa a ser la de bronze para ese archivo: así la ruta por
+    archivo de silver también reconoce el mes como cargado.
+    """
+    ensure_fingerprint_table(cur, silver_schema_ref)
+    invalidate_fingerprint(cur, silver_schema_ref, SILVER_TABLE, fname)
+    cur.execute(f"""
+        INSERT INTO {silver_schema_ref}.{FINGERPRINT_TABLE}
+        (TARGET_TABLE,SOURCE_FILE,SERVICE,ETAG,LAST_MODIFIED,BYTES,ROWS_IN_FILE,CONTENT_SHA256,LOADED_TS)
+        SELECT %s, SOURCE_FILE, SERVICE, ETAG, LAST_MODIFIED, BYTES, ROWS_IN_FILE, CONTENT_SHA256,
+               CURRENT_TIMESTAMP()
+        FROM {bronze_schema_ref}.{FINGERPRINT_TABLE}
+        WHERE TARGET_TABLE = %s AND SOURCE_FILE = %s
+        ORDER BY LOADED_TS DESC
+        LIMIT 1
+    """, (SILVER_TABLE, bronze_table, fname))
+
+
+def build_silver_month(cur, database, bronze_schema, service, fname):
+    """
+    Reemplaza las filas de fname en SILVER.TAXI_TRIPS_ALL derivándolas de la
+    tabla bronze del servicio. Devuelve las filas insertadas.
+    """
+    bronze_table = BRONZE_TABLES[service]
+    bronze_ref = f"{database}.{bronze_schema}.{bronze_table}"
+    silver_schema_ref = f"{database}.{SILVER_SCHEMA}"
+    silver_ref = f"{silver_schema_ref}.{SILVER_TABLE}"
+    ensure_zones_table(cur, silver_schema_ref)
+    ensure_zone_columns(cur, silver_ref)
+
+    print(f"🥈 {fname}: {bronze_ref} → {silver_ref} …")
+    with span("silver_build", file=fname) as sp:
+        cur.execute("BEGIN")
+        try:
+            cur.execute(f"DELETE FROM {silver_ref} WHERE SOURCE_FILE = %s", (fname,))
+            cur.execute(silver_insert_sql(service, bronze_ref, silver_ref,
+                                          f"{silver_schema_ref}.{ZONES_TABLE}"), (fname,))
+            sp["rows"] = inserted = cur.rowcount
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    copy_fingerprint(cur, f"{database}.{bronze_schema}", silver_schema_ref, bronze_table, fname)
+    print(f"✅ {fname} en silver: {inserted} filas")
+    return inserted
+
+
+def build_silver_from_bronze(*, year:int, month:int, service:str, bronze_default_schema:str="BRONZE"):
+    """
+    Modo source="bronze" de los loaders de silver: deriva el mes desde bronze sin
+    descargar ni subir nada. MISSING si el archivo todavía no está en bronze.
+    """
+    fname = f"{service}_tripdata_{year}-{month:02d}.parquet"
+    conn, sf_database, bronze_schema = acquire_connection(default_schema=bronze_default_schema)
+    cur = conn.cursor()
+    try:
+        bronze_ref = f"{sf_database}.{bronze_schema}.{BRONZE_TABLES[service]}"
+        cur.execute(f"SELECT COUNT(*) FROM {bronze_ref} WHERE SOURCE_FILE = %s", (fname,))
+        rows_in_bronze = cur.fetchone()[0]
+        if not rows_in_bronze:
+            print(f"⚠️ {fname} no está en {bronze_ref}")
+            return {"file": fname, "year": year, "month": month, "status": "MISSING"}
+        inserted = build_silver_month(cur, sf_database, bronze_schema, service, fname)
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    return {
+        "file": fname,
+        "year": year,
+        "month": month,
+        "rows_in_file": rows_in_bronze,
+        "rows_inserted": inserted,
+    }
@@ -0,0 +1,115 @@
+# pool de sesiones Snowflake compartido por los loaders
+#
+# - los secrets se resuelven una sola vez por proceso
+# - las conexiones se reutilizan (una lista de sesiones libres por schema)
+# - el DDL de objetos base (file format, stage, tablas) corre una vez por proceso
+# snowflake.connector y los secrets de Mage se importan recién al conectar, así
+# los loaders se pueden importar sin ellos (p. ej. en benchmarks/ con DuckDB).
+
+import threading
+from utils.metrics import span
+
+_lock = threading.Lock()
+_credentials = None
+_idle = {}            # schema -> [conexiones libres]
+_bootstrapped = set()
+MAX_IDLE_PER_SCHEMA = 8
+
+
+def need(name, val):
+    if not val:
+        raise Exception(f"Falta el secret '{name}' en Mage (Settings → Secrets).")
+    return val
+
+
+def get_credentials():
+    """
+    Secrets de Snowflake resueltos una vez y cacheados para todo el proceso.
+    """
+    global _credentials
+    from mage_ai.data_preparation.shared.secrets import get_secret_value
+    with _lock:
+        if _credentials is None:
+            with span("secrets"):
+                _credentials = {
+                    "user":      need("SNOWFLAKE_USER",      get_secret_value("SNOWFLAKE_USER")),
+                    "password":  need("SNOWFLAKE_PASSWORD",  get_secret_value("SNOWFLAKE_PASSWORD")),
+                    "account":   need("SNOWFLAKE_ACCOUNT",   get_secret_value("SNOWFLAKE_ACCOUNT")),
+                    "warehouse": get_secret_value("SNOWFLAKE_WAREHOUSE") or "WH_INGEST",
+                    "database":  get_secret_value("SNOWFLAKE_DATABASE")  or "NYC_TAXI",
+                    "schema":    get_secret_value("SNOWFLAKE_SCHEMA"),
+                }
+        return _credentials
+
+
+def acquire_connection(schema=None, default_schema="BRONZE"):
+    """
+    Devuelve (conn, database, schema) con una sesión tibia del pool o una nueva.
+    schema fuerza el schema (p. ej. SILVER); si no, se usa el secret
+    SNOWFLAKE_SCHEMA o default_schema. Devolver con release_connection.
+    """
+    creds = get_credentials()
+    sf_schema = schema or creds["schema"] or default_schema
+
+    with _lock:
+        idle = _idle.get(sf_schema, [])
+        while idle:
+            conn = idle.pop()
+            if not conn.is_closed():
+                return conn, creds["database"], sf_schema
+
+    import snowflake.connector
+    with span("connect", schema=sf_schema):
+        conn = snowflake.connector.connect(
+            user=creds["user"],
+            password=creds["password"],
+            account=creds["account"],
+            role="SYSADMIN",
+            warehouse=creds["warehouse"],
+            database=creds["database"],
+            schema=sf_schema,
+            client_session_keep_alive=True,
+            insecure_mode=True
+        )
+    conn._pool_schema = sf_schema
+    return conn, creds["database"], sf_schema
+
+
+def release_connection(conn):
+    """
+    Devuelve la sesión al pool (o la cierra si el pool de ese schema está lleno).
+    """
+    schema = getattr(conn, "_pool_schema", None)
+    if schema is None or conn.is_closed():
+        conn.close()
+        return
+    with _lock:
+        idle = _idle.setdefault(schema, [])
+        if len(idle) < MAX_IDLE_PER_SCHEMA:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def close_all():
+    """
+    Cierra todas las sesiones libres (fin del backfill).
+    """
+    with _lock:
+        conns = [c for idle in _idle.values() for c in idle]
+        _idle.clear()
+    for conn in conns:
+        conn.close()
+
+
+def bootstrap_once(cur, key, *statements):
+    """
+    Ejecuta los statements DDL de key solo la primera vez en este proceso.
+    """
+    with _lock:
+        if key in _bootstrapped:
+            return
+    for sql in statements:
+        cur.execute(sql)
+    with _lock:
+        _bootstrapped.add(key)
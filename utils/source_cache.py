@@ -0,0 +1,307 @@
+# caché local de fuentes descargadas (Parquet de TLC, taxi_zones.csv, titanic.csv)
+#
+# Antes la única política era os.path.exists: los meses quedaban para siempre en
+# data/nyc_tlc y un archivo truncado o tocado a mano se usaba igual. Ahora
+# ensure_local_file pasa por SourceCache:
+# - índice en data/.source_cache.json con la integridad de cada entrada (url,
+#   tamaño, mtime, sha256), la huella remota con la que se bajó (ETag /
+#   Last-Modified / Content-Length) y el último acceso; si el archivo en disco no
+#   coincide con su entrada, o la fuente ya no coincide con la huella con la que
+#   se bajó (lookup con remote), se descarta y se vuelve a descargar
+# - cuota de disco (SOURCE_CACHE_QUOTA_GB, default 100) con desalojo LRU; al
+#   desalojar un mes también se borran sus copias en prepared/ y
+#   prepared_silver/ y sus partes de upload_mode='parts', que cuentan para la cuota
+# - pins: los archivos que toca un mes en curso quedan fijados hasta que el mes
+#   termina (pinning() en utils.backfill), así un worker no le borra el archivo a
+#   otro entre la descarga y el PUT
+# - contadores de hits / misses / inválidos / desalojos, por proceso y acumulados
+# Los pins son del proceso: dos procesos con la misma carpeta comparten índice
+# pero no se ven los pins.
+
+import contextvars
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+INDEX_PATH = "data/.source_cache.json"
+DEFAULT_QUOTA_GB = 100
+DERIVED_DIRS = ("prepared", "prepared_silver")
+HASH_BLOCK = 8 * 1024 * 1024
+COUNTERS = ("hits", "misses", "invalid", "evictions", "bytes_evicted")
+
+_scope = contextvars.ContextVar("source_pin_scope", default=None)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def derived_paths(path):
+    """
+    Copias preprocesadas de path (arrow_prep las guarda con el mismo nombre) y
+    sus partes de upload_mode='parts' (utils.staging.split_parquet).
+    """
+    folder, name = os.path.split(path)
+    stem = name.rsplit(".parquet", 1)[0]
+    paths = [os.path.join(folder, sub, name) for sub in DERIVED_DIRS]
+    for base in [folder, *(os.path.join(folder, sub) for sub in DERIVED_DIRS)]:
+        paths += glob.glob(os.path.join(glob.escape(base), "parts", glob.escape(stem) + ".part*"))
+    return paths
+
+
+def remote_matches(entry, remote):
+    """
+    True si la entrada de la caché se bajó con la misma huella remota (HEAD).
+    Se prefiere el ETag; si no, Last-Modified y tamaño (Content-Length).
+    Sin datos para comparar se da por buena.
+    """
+    if not remote:
+        return True
+    if remote.get("etag") and entry.get("etag"):
+        return remote["etag"] == entry["etag"]
+    if remote.get("last_modified") and entry.get("last_modified") and remote["last_modified"] != entry["last_modified"]:
+        return False
+    return remote.get("bytes") is None or remote["bytes"] == entry["size"]
+
+
+def _size_on_disk(path):
+    return sum(os.path.getsize(p) for p in [path, *derived_paths(path)] if os.path.exists(p))
+
+
+class PinScope:
+    """
+    Archivos fijados por un mes en curso; release() los libera todos.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.paths = []
+
+    def add(self, path):
+        self.cache.pin(path)
+        self.paths.append(path)
+
+    def release(self):
+        for path in self.paths:
+            self.cache.unpin(path)
+        self.paths = []
+
+
+class SourceCache:
+    def __init__(self, index_path=INDEX_PATH, quota_bytes=None, verify_hash=False):
+        self.index_path = index_path
+        self.quota_bytes = quota_bytes
+        self.verify_hash = verify_hash
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.RLock()
+        self._pins = {}
+        self._entries, self._totals = self._load()
+
+    # -------- índice --------
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            return data.get("entries", {}), {**dict.fromkeys(COUNTERS, 0), **data.get("totals", {})}
+        except (FileNotFoundError, ValueError):
+            return {}, dict.fromkeys(COUNTERS, 0)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": self._entries, "totals": self._totals}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _count(self, counter, n=1):
+        self.counters[counter] += n
+        self._totals[counter] += n
+
+    # -------- pins --------
+    def pin(self, path):
+        key = os.path.normpath(path)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, path):
+        key = os.path.normpath(path)
+        with self._lock:
+            left = self._pins.get(key, 0) - 1
+            if left > 0:
+                self._pins[key] = left
+            else:
+                self._pins.pop(key, None)
+
+    def _pin_in_scope(self, path):
+        scope = _scope.get()
+        if scope is not None:
+            scope.add(path)
+
+    # -------- entradas --------
+    def _drop(self, key):
+        for p in [key, *derived_paths(key)]:
+            if os.path.exists(p):
+                os.remove(p)
+        self._entries.pop(key, None)
+
+    def lookup(self, path, url, validate=None, remote=None):
+        """
+        True si path está en disco y es válido (hit: se fija y se marca como
+        usado). Un archivo que no coincide con su entrada, o bajado con otra
+        huella que remote (HEAD actual de la fuente), se borra (miss).
+        Archivos previos a la caché se adoptan si pasan validate.
+        """
+        key = os.path.normpath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not os.path.exists(key):
+                self._entries.pop(key, None)
+                self._count("misses")
+                self._save()
+                return False
+            st = os.stat(key)
+            if entry is None:
+                ok = validate is None or validate(key)
+                if ok:
+                    entry = self._entries[key] = self._entry(key, url)
+            else:
+                ok = (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns)
+                if ok and self.verify_hash:
+                    ok = file_sha256(key) == entry["sha256"]
+            if not ok:
+                print(f"⚠️ {key} está corrupto, truncado o cambió en disco, se vuelve a descargar")
+            elif not remote_matches(entry, remote):
+                print(f"⚠️ {key} cambió en la fuente (ETag / tamaño distinto al de la descarga), "
+                      f"se vuelve a descargar")
+                ok = False
+            if not ok:
+                self._drop(key)
+                self._count("invalid")
+                self._count("misses")
+                self._save()
+                return False
+            entry["last_access"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._count("hits")
+            self._pin_in_scope(key)
+            self._save()
+        return True
+
+    def _entry(self, key, url, remote=None):
+        st = os.stat(key)
+        remote = remote or {}
+        return {"url": url, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "sha256": file_sha256(key), "etag": remote.get("etag"),
+                "last_modified": remote.get("last_modified"), "created": time.time(),
+                "last_access": time.time(), "hits": 0}
+
+    def remote_of(self, path):
+        """
+        Huella remota con la que se bajó path ({} si no está en la caché).
+        """
+        with self._lock:
+            entry = self._entries.get(os.path.normpath(path)) or {}
+        return {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")} if entry else {}
+
+    def record(self, path, url, remote=None):
+        """
+        Registra un archivo recién descargado (con la huella remota de la
+        descarga), lo fija y aplica la cuota.
+        """
+        key = os.path.normpath(path)
+        entry = self._entry(key, url, remote)
+        with self._lock:
+            self._entries[key] = entry
+            self._pin_in_scope(key)
+            self.enforce_quota()
+            self._save()
+
+    def reserve(self, path):
+        """
+        Antes de descargar: libera lugar para el archivo (su tamaño anterior si
+        ya estuvo en la caché, si no el promedio de las entradas).
+        """
+        key = os.path.normpath(path)
+        with self._lock:
+            if self.quota_bytes is None:
+                return
+            sizes = [e["size"] for e in self._entries.values()]
+            expected = self._entries.get(key, {}).get("size") or (sum(sizes) // len(sizes) if sizes else 0)
+            self.enforce_quota(self.quota_bytes - expected)
+            self._save()
+
+    def enforce_quota(self, limit=None):
+        """
+        Desaloja las entradas menos usadas recientemente (sin pins) hasta que el
+        uso quede bajo limit (por defecto la cuota).
+        """
+        limit = self.quota_bytes if limit is None else limit
+        if limit is None:
+            return
+        with self._lock:
+            sizes = {key: _size_on_disk(key) for key in self._entries}
+            usage = sum(sizes.values())
+            for key in sorted(self._entries, key=lambda k: self._entries[k]["last_access"]):
+                if usage <= limit:
+                    break
+                if self._pins.get(key):
+                    continue
+                self._drop(key)
+                usage -= sizes[key]
+                self._count("evictions")
+                self._count("bytes_evicted", sizes[key])
+                print(f"🧹 caché de fuentes: se desaloja {key} ({sizes[key] / 1e6:.1f} MB)")
+            if usage > limit:
+                print(f"⚠️ caché de fuentes en {usage / 1e9:.1f} GB, sobre el límite de "
+                      f"{limit / 1e9:.1f} GB: lo que queda está fijado por meses en curso")
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters,
+                    "entries": len(self._entries),
+                    "bytes": sum(_size_on_disk(key) for key in self._entries),
+                    "pinned": len(self._pins),
+                    "quota_bytes": self.quota_bytes,
+                    "totals": dict(self._totals)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_source_cache():
+    """
+    Caché del proceso; cuota en GB desde SOURCE_CACHE_QUOTA_GB (0 = sin cuota),
+    SOURCE_CACHE_VERIFY=1 verifica el sha256 en cada hit.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            quota_gb = float(os.getenv("SOURCE_CACHE_QUOTA_GB", DEFAULT_QUOTA_GB))
+            _cache = SourceCache(quota_bytes=int(quota_gb * 1e9) if quota_gb > 0 else None,
+                                 verify_hash=os.getenv("SOURCE_CACHE_VERIFY") == "1")
+        return _cache
+
+
+@contextmanager
+def pinning(scope=None, *, release=True):
+    """
+    Los archivos que ensure_local_file entregue dentro del bloque quedan fijados
+    en scope hasta scope.release() (al salir, si release).
+    """
+    scope = scope or PinScope(get_source_cache())
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        if release:
+            scope.release()
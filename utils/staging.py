@@ -0,0 +1,204 @@
+# staging compartido por los loaders (archivo local → stage → tabla VARIANT)
+#
+# upload_mode='parts': en vez de un PUT y un COPY de un solo archivo por mes, el
+# Parquet se parte por row groups en partes de ~PART_TARGET_MB (split_parquet),
+# las partes se suben con PUT en paralelo (PUT_THREADS hilos, cada uno con su
+# cursor y reintentos propios, sin gzip encima del Parquet) y un solo COPY con
+# FILES = (...) carga el juego completo, así el warehouse reparte las partes
+# entre sus nodos. Cada parte lleva __row_number (posición de la fila en el
+# archivo original) para que el CHUNK_ID sea el mismo que con un solo archivo.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.metrics import span
+from utils.retry import run_with_retries
+from utils.snowflake_pool import bootstrap_once
+
+UPLOAD_MODES = ("single", "parts")
+PART_TARGET_MB = float(os.getenv("PART_TARGET_MB", 128))
+PUT_THREADS = 4
+ROW_NUMBER_COL = "__row_number"
+PARTS_DIR = "parts"
+
+
+def create_parquet_stage(cur, schema_ref, stage_name):
+    """
+    FILE FORMAT Parquet + stage interno en schema_ref (p. ej. NYC_TAXI.BRONZE).
+    Solo se ejecuta una vez por proceso (ver snowflake_pool.bootstrap_once).
+    """
+    bootstrap_once(
+        cur, f"{schema_ref}.{stage_name}",
+        f"CREATE FILE FORMAT IF NOT EXISTS {schema_ref}.PARQUET_FORMAT TYPE=PARQUET",
+        f"CREATE STAGE IF NOT EXISTS {schema_ref}.{stage_name} "
+        f"FILE_FORMAT={schema_ref}.PARQUET_FORMAT",
+    )
+
+
+def split_parquet(local_path, *, target_mb=None):
+    """
+    Parte local_path en <dir>/parts/<nombre>.part-NNN.parquet agrupando row
+    groups consecutivos hasta ~target_mb comprimidos por parte (un row group no
+    se corta). Mantiene el codec del original y agrega __row_number. Si las
+    partes ya están armadas para este archivo (manifiesto) se reutilizan.
+    Devuelve las rutas de las partes en orden.
+    """
+    target_mb = target_mb or PART_TARGET_MB
+    parts_dir = os.path.join(os.path.dirname(local_path), PARTS_DIR)
+    stem = os.path.basename(local_path).rsplit(".parquet", 1)[0]
+    manifest_path = os.path.join(parts_dir, f"{stem}.parts.json")
+    st = os.stat(local_path)
+    source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "target_mb": target_mb}
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        paths = [os.path.join(parts_dir, p["name"]) for p in manifest["parts"]]
+        if manifest["source"] == source and all(os.path.exists(p) for p in paths):
+            return paths
+
+    os.makedirs(parts_dir, exist_ok=True)
+    pf = pq.ParquetFile(local_path)
+    meta = pf.metadata
+    codec = meta.row_group(0).column(0).compression.lower() if meta.num_row_groups else "snappy"
+    schema = pf.schema_arrow.append(pa.field(ROW_NUMBER_COL, pa.int64()))
+
+    groups, current, current_bytes = [], [], 0
+    for i in range(meta.num_row_groups):
+        current.append(i)
+        rg = meta.row_group(i)
+        current_bytes += sum(rg.column(c).total_compressed_size for c in range(rg.num_columns))
+        if current_bytes >= target_mb * 1024 * 1024:
+            groups.append(current)
+            current, current_bytes = [], 0
+    if current or not groups:
+        groups.append(current)
+
+    parts, offset = [], 0
+    with span("split", file=os.path.basename(local_path), bytes=st.st_size) as sp:
+        for n, row_groups in enumerate(groups):
+            name = f"{stem}.part-{n:03d}.parquet"
+            part_path = os.path.join(parts_dir, name)
+            rows = 0
+            with pq.ParquetWriter(part_path + ".part", schema, compression=codec) as writer:
+                for i in row_groups:
+                    table = pf.read_row_group(i)
+                    numbers = pa.array(range(offset + rows, offset + rows + table.num_rows), type=pa.int64())
+                    writer.write_table(table.append_column(ROW_NUMBER_COL, numbers))
+                    rows += table.num_rows
+            os.replace(part_path + ".part", part_path)
+            parts.append({"name": name, "rows": rows, "bytes": os.path.getsize(part_path)})
+            offset += rows
+        sp["rows"] = offset
+
+    with open(manifest_path, "w") as f:
+        json.dump({"source": source, "parts": parts}, f, indent=1)
+    print(f"✂️ {os.path.basename(local_path)}: {len(parts)} partes de "
+          f"~{sum(p['bytes'] for p in parts) / len(parts) / 1e6:.0f} MB")
+    return [os.path.join(parts_dir, p["name"]) for p in parts]
+
+
+def put_parts(cur, part_paths, stage_ref, *, threads=PUT_THREADS, retries=3):
+    """
+    PUT de las partes en paralelo, cada hilo con su cursor. Parquet ya viene
+    comprimido por columna: AUTO_COMPRESS=FALSE evita gzipear de nuevo. Una
+    parte que falla se reintenta sola, sin volver a subir las demás.
+    """
+    conn = cur.connection
+
+    def _put(path):
+        name = os.path.basename(path)
+        part_cur = conn.cursor()
+        try:
+            with span("put_part", file=name, bytes=os.path.getsize(path)):
+                run_with_retries(
+                    lambda attempt: part_cur.execute(
+                        f"PUT file://{os.path.abspath(path)} @{stage_ref} "
+                        f"OVERWRITE=TRUE AUTO_COMPRESS=FALSE SOURCE_COMPRESSION=NONE"),
+                    retries=retries, label=f"PUT {name}")
+        finally:
+            part_cur.close()
+
+    print(f"Subiendo {len(part_paths)} partes al stage ({min(threads, len(part_paths))} hilos)…")
+    total = sum(os.path.getsize(p) for p in part_paths)
+    with span("put", file=os.path.basename(part_paths[0]), bytes=total, parts=len(part_paths)):
+        with ThreadPoolExecutor(max_workers=max(1, min(threads, len(part_paths))),
+                                thread_name_prefix="put") as pool:
+            list(pool.map(_put, part_paths))
+
+
+def put_file(cur, local_path, stage_ref, parts=None):
+    """
+    Sube el archivo local al stage (PUT), sobrescribiendo la versión anterior.
+    Con parts (ver split_parquet) sube las partes en paralelo en su lugar.
+    """
+    if parts:
+        return put_parts(cur, parts, stage_ref)
+    print(f"Subiendo {os.path.basename(local_path)} al stage…")
+    with span("put", file=os.path.basename(local_path), bytes=os.path.getsize(local_path)):
+        cur.execute(f"PUT file://{os.path.abspath(local_path)} @{stage_ref} OVERWRITE=TRUE")
+
+
+def stage_source(stage_ref, fname, parts=None):
+    """
+    Cláusula FROM (y FILES) del COPY: el archivo del mes o el juego de partes.
+    """
+    if not parts:
+        return f"@{stage_ref}/{fname}", ""
+    files = ", ".join(f"'{os.path.basename(p)}'" for p in parts)
+    return f"@{stage_ref}", f"FILES = ({files})"
+
+
+def copy_to_chunked_staging(cur, tmp_table, stage_ref, fname, chunk_size, parts=None, shared=False):
+    """
+    Crea la tabla temporal (V VARIANT, CHUNK_ID NUMBER) y hace COPY INTO desde el
+    stage asignando el chunk una sola vez con METADATA$FILE_ROW_NUMBER.
+    Así cada INSERT por chunk lee solo sus filas (WHERE CHUNK_ID = n) en lugar de
+    re-ordenar el mes completo con ROW_NUMBER() en cada chunk.
+    Con parts el chunk sale de __row_number (la numeración de cada parte
+    arranca de nuevo) y un solo COPY carga todas las partes.
+    Con shared la tabla es TRANSIENT en lugar de TEMP, para que la lean los
+    chunks en vuelo desde otras sesiones (utils.chunk_runner); hay que borrarla
+    al terminar.
+    Devuelve las filas cargadas.
+    """
+    kind = "TRANSIENT" if shared else "TEMP"
+    cur.execute(f"CREATE OR REPLACE {kind} TABLE {tmp_table} (V VARIANT, CHUNK_ID NUMBER)")
+
+    source, files = stage_source(stage_ref, fname, parts)
+    if parts:
+        chunk_expr = f'FLOOR($1:"{ROW_NUMBER_COL}"::NUMBER / {int(chunk_size)}) + 1'
+    else:
+        chunk_expr = f"FLOOR((METADATA$FILE_ROW_NUMBER - 1) / {int(chunk_size)}) + 1"
+
+    print("COPY INTO staging VARIANT (con CHUNK_ID) …")
+    with span("copy", file=fname) as sp:
+        cur.execute(f"""
+            COPY INTO {tmp_table}(V, CHUNK_ID)
+            FROM (
+                SELECT $1, {chunk_expr}
+                FROM {source}
+            )
+            {files}
+            FILE_FORMAT = (TYPE=PARQUET)
+            ON_ERROR = ABORT_STATEMENT
+        """)
+        # resultado del COPY: (file, status, rows_parsed, rows_loaded, ...)
+        sp["rows"] = sum(int(row[3] or 0) for row in cur.fetchall())
+    return sp["rows"]
+
+
+def drop_staging(cur, tmp_table):
+    """
+    Borra la tabla de staging del mes. Los loaders la llaman en un finally: la
+    TRANSIENT de shared=True no muere con la sesión y quedaría para siempre si
+    falla un chunk. Un mes retomado la vuelve a armar desde el stage, así que no
+    hace falta conservarla. Un error al borrarla solo se avisa, para no tapar
+    el error original.
+    """
+    try:
+        cur.execute(f"DROP TABLE IF EXISTS {tmp_table}")
+    except Exception as e:
+        print(f"⚠️ no se pudo borrar el staging {tmp_table}: {e}")
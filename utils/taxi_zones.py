@@ -0,0 +1,121 @@
+# lookup de taxi zones (LocationID → borough / zone / service_zone) en memoria
+#
+# data/taxi_zones.csv se carga una vez por proceso como arrays densos indexados
+# por LocationID (posición = id, nulos en los huecos), así el enriquecimiento de
+# silver es un pc.take vectorizado por row group en vez de un JOIN en cada query.
+# La versión del lookup es el sha256 del CSV: si el archivo cambia se recarga, y
+# el Parquet preparado de silver la guarda en su metadata para saber si quedó
+# enriquecido con una versión vieja.
+
+import hashlib
+import os
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from utils.downloads import ensure_local_file
+from utils.snowflake_pool import bootstrap_once
+
+TAXI_ZONES_URL = "https://d37ci6vzurychx.cloudfront.net/misc/taxi_zone_lookup.csv"
+LOCAL_CSV = "data/taxi_zones.csv"
+ZONES_TABLE = "TAXI_ZONES"
+ZONE_FIELDS = {"borough": "Borough", "zone": "Zone", "service_zone": "service_zone"}
+# columnas de silver: prefijo → columna de LocationID en el Parquet fuente
+ZONE_PREFIXES = {"pu": "PULocationID", "do": "DOLocationID"}
+ZONE_COLUMNS = [f"{p}_{f}".upper() for p in ZONE_PREFIXES for f in ZONE_FIELDS]
+# mismas columnas desde el JOIN con <schema>.TAXI_ZONES (ver zone_joins)
+ZONE_EXPRS = ["ZPU.BOROUGH", "ZPU.ZONE", "ZPU.SERVICE_ZONE", "ZDO.BOROUGH", "ZDO.ZONE", "ZDO.SERVICE_ZONE"]
+
+_lock = threading.Lock()
+_cache = {}   # ruta -> (mtime, tamaño, ZoneLookup)
+
+
+class ZoneLookup:
+    """
+    Arrays densos de borough / zone / service_zone indexados por LocationID.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.version = hashlib.sha256(f.read()).hexdigest()[:16]
+        table = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(
+            column_types={"LocationID": pa.int64(), **{c: pa.string() for c in ZONE_FIELDS.values()}}))
+        ids = table["LocationID"].to_pylist()
+        self.max_id = max(i for i in ids if i is not None)
+        self.arrays = {}
+        for field, col in ZONE_FIELDS.items():
+            dense = [None] * (self.max_id + 1)
+            for loc_id, value in zip(ids, table[col].to_pylist()):
+                if loc_id is not None and loc_id >= 0:
+                    dense[loc_id] = value
+            self.arrays[field] = pa.array(dense, type=pa.string())
+
+    def gather(self, location_ids):
+        """
+        Devuelve {campo: array} alineado con location_ids. Ids nulos o fuera de
+        rango quedan en nulo, igual que un LEFT JOIN.
+        """
+        ids = pc.cast(location_ids, pa.int64(), safe=False)
+        in_range = pc.and_(pc.greater_equal(ids, 0), pc.less_equal(ids, self.max_id))
+        idx = pc.if_else(in_range, ids, pa.scalar(None, pa.int64()))
+        return {field: pc.take(arr, idx) for field, arr in self.arrays.items()}
+
+    def enrich(self, table):
+        """
+        Agrega pu_/do_ borough, zone y service_zone a la tabla (sin distinguir
+        mayúsculas en los nombres de LocationID).
+        """
+        by_lower = {name.lower(): name for name in table.column_names}
+        for prefix, id_col in ZONE_PREFIXES.items():
+            actual = by_lower.get(id_col.lower())
+            if actual is None:
+                gathered = {f: pa.nulls(table.num_rows, type=pa.string()) for f in ZONE_FIELDS}
+            else:
+                gathered = self.gather(table[actual])
+            for field, arr in gathered.items():
+                table = table.append_column(f"{prefix}_{field}", arr)
+        return table
+
+
+def get_zone_lookup(path=LOCAL_CSV, *, download=True):
+    """
+    ZoneLookup cacheado del proceso; se recarga si el CSV cambió (mtime/tamaño).
+    """
+    if download:
+        ensure_local_file(TAXI_ZONES_URL, path, validate=None, retries=5, delay=5, timeout=120)
+    stat = os.stat(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+    lookup = ZoneLookup(path)
+    with _lock:
+        _cache[path] = (stat.st_mtime, stat.st_size, lookup)
+    print(f"🗺️ taxi zones v{lookup.version}: LocationID 0…{lookup.max_id}")
+    return lookup
+
+
+def ensure_zones_table(cur, schema_ref):
+    bootstrap_once(cur, f"{schema_ref}.{ZONES_TABLE}", f"""
+        CREATE TABLE IF NOT EXISTS {schema_ref}.{ZONES_TABLE} (
+            LOCATIONID    NUMBER(38,0),
+            BOROUGH       STRING,
+            ZONE          STRING,
+            SERVICE_ZONE  STRING
+        )
+    """)
+
+
+def zone_joins(zones_ref, pu_expr, do_expr):
+    """
+    LEFT JOINs con la tabla de zonas para pickup (ZPU) y dropoff (ZDO); las
+    columnas salen de ZONE_EXPRS.
+    """
+    return (f"LEFT JOIN {zones_ref} ZPU ON ZPU.LOCATIONID = {pu_expr}\n"
+            f"        LEFT JOIN {zones_ref} ZDO ON ZDO.LOCATIONID = {do_expr}")
+
+
+def ensure_zone_columns(cur, table_ref):
+    bootstrap_once(cur, f"{table_ref}:zones", *[
+        f"ALTER TABLE {table_ref} ADD COLUMN IF NOT EXISTS {col} STRING" for col in ZONE_COLUMNS
+    ])
@@ -0,0 +1,123 @@
+# COPY tipado directo (Parquet → tabla final) sin pasar por la tabla VARIANT
+#
+# Cada spec es una lista de (columna_destino, columna_parquet, tipo_snowflake, requerida).
+# La columna parquet se busca sin distinguir mayúsculas (Airport_fee / airport_fee)
+# y se castea directo desde $1 sin el ida y vuelta por ::string de TRY_TO_*.
+
+import pyarrow.types as pat
+from utils.metrics import span
+from utils.staging import stage_source
+
+YELLOW_BRONZE_SPEC = [
+    ("VENDOR_ID",             "VendorID",              "NUMBER",        True),
+    ("TPEP_PICKUP_DATETIME",  "tpep_pickup_datetime",  "TIMESTAMP_NTZ", True),
+    ("TPEP_DROPOFF_DATETIME", "tpep_dropoff_datetime", "TIMESTAMP_NTZ", True),
+    ("PASSENGER_COUNT",       "passenger_count",       "NUMBER",        True),
+    ("TRIP_DISTANCE",         "trip_distance",         "NUMBER(12,3)",  True),
+    ("RATECODE_ID",           "RatecodeID",            "NUMBER",        True),
+    ("STORE_AND_FWD_FLAG",    "store_and_fwd_flag",    "STRING",        True),
+    ("PULOCATION_ID",         "PULocationID",          "NUMBER",        True),
+    ("DOLOCATION_ID",         "DOLocationID",          "NUMBER",        True),
+    ("PAYMENT_TYPE",          "payment_type",          "NUMBER",        True),
+    ("FARE_AMOUNT",           "fare_amount",           "NUMBER(12,2)",  True),
+    ("EXTRA",                 "extra",                 "NUMBER(12,2)",  True),
+    ("MTA_TAX",               "mta_tax",               "NUMBER(12,2)",  True),
+    ("TIP_AMOUNT",            "tip_amount",            "NUMBER(12,2)",  True),
+    ("TOLLS_AMOUNT",          "tolls_amount",          "NUMBER(12,2)",  True),
+    ("IMPROVEMENT_SURCHARGE", "improvement_surcharge", "NUMBER(12,2)",  True),
+    ("TOTAL_AMOUNT",          "total_amount",          "NUMBER(12,2)",  True),
+    ("CONGESTION_SURCHARGE",  "congestion_surcharge",  "NUMBER(12,2)",  False),
+    ("AIRPORT_FEE",           "airport_fee",           "NUMBER(12,2)",  False),
+    ("CBD_CONGESTION_FEE",    "cbd_congestion_fee",    "NUMBER(12,2)",  False),
+]
+
+GREEN_BRONZE_SPEC = [
+    ("VENDORID",              "VendorID",              "NUMBER",        True),
+    ("LPEP_PICKUP_DATETIME",  "lpep_pickup_datetime",  "TIMESTAMP_NTZ", True),
+    ("LPEP_DROPOFF_DATETIME", "lpep_dropoff_datetime", "TIMESTAMP_NTZ", True),
+    ("STORE_AND_FWD_FLAG",    "store_and_fwd_flag",    "STRING",        True),
+    ("RATECODEID",            "RatecodeID",            "NUMBER",        True),
+    ("PULOCATIONID",          "PULocationID",          "NUMBER",        True),
+    ("DOLOCATIONID",          "DOLocationID",          "NUMBER",        True),
+    ("PASSENGER_COUNT",       "passenger_count",       "NUMBER",        True),
+    ("TRIP_DISTANCE",         "trip_distance",         "NUMBER(12,3)",  True),
+    ("FARE_AMOUNT",           "fare_amount",           "NUMBER(12,2)",  True),
+    ("EXTRA",                 "extra",                 "NUMBER(12,2)",  True),
+    ("MTA_TAX",               "mta_tax",               "NUMBER(12,2)",  True),
+    ("TIP_AMOUNT",            "tip_amount",            "NUMBER(12,2)",  True),
+    ("TOLLS_AMOUNT",          "tolls_amount",          "NUMBER(12,2)",  True),
+    ("EHAIL_FEE",             "ehail_fee",             "NUMBER(12,2)",  False),
+    ("IMPROVEMENT_SURCHARGE", "improvement_surcharge", "NUMBER(12,2)",  True),
+    ("TOTAL_AMOUNT",          "total_amount",          "NUMBER(12,2)",  True),
+    ("PAYMENT_TYPE",          "payment_type",          "NUMBER",        True),
+    ("TRIP_TYPE",             "trip_type",             "NUMBER",        True),
+    ("CONGESTION_SURCHARGE",  "congestion_surcharge",  "NUMBER(12,2)",  False),
+    ("CBD_CONGESTION_FEE",    "cbd_congestion_fee",    "NUMBER(12,2)",  False),
+]
+
+
+class SchemaMismatch(Exception):
+    """
+    El archivo no tiene el esquema esperado: se usa la ruta VARIANT.
+    """
+
+
+def _type_matches(arrow_type, sf_type):
+    if pat.is_null(arrow_type):
+        return True
+    if sf_type.startswith("NUMBER"):
+        return pat.is_integer(arrow_type) or pat.is_floating(arrow_type) or pat.is_decimal(arrow_type)
+    if sf_type.startswith("TIMESTAMP"):
+        return pat.is_timestamp(arrow_type)
+    return pat.is_string(arrow_type) or pat.is_large_string(arrow_type)
+
+
+def resolve_columns(arrow_schema, spec):
+    """
+    Mapea cada columna destino al nombre real en el archivo (o None si es opcional
+    y no existe). Lanza SchemaMismatch si falta una requerida o el tipo no cuadra.
+    """
+    by_lower = {name.lower(): name for name in arrow_schema.names}
+    resolved = []
+    for target, source, sf_type, required in spec:
+        actual = by_lower.get(source.lower())
+        if actual is None:
+            if required:
+                raise SchemaMismatch(f"falta la columna {source}")
+            resolved.append((target, None, sf_type))
+            continue
+        arrow_type = arrow_schema.field(actual).type
+        if not _type_matches(arrow_type, sf_type):
+            raise SchemaMismatch(f"{actual} es {arrow_type}, se esperaba {sf_type}")
+        resolved.append((target, actual, sf_type))
+    return resolved
+
+
+def typed_copy(cur, table_ref, stage_ref, fname, resolved, parts=None):
+    """
+    COPY INTO table_ref directo desde el archivo del stage con una transformación
+    que castea cada campo a su tipo destino y llena SOURCE_FILE con el nombre del
+    archivo. Con parts carga el juego de partes en un COPY (SOURCE_FILE sigue
+    siendo el archivo original). Devuelve las filas cargadas.
+    """
+    targets = [t for t, _, _ in resolved] + ["SOURCE_FILE"]
+    exprs = [f'$1:"{src}"::{sf_type}' if src else "NULL" for _, src, sf_type in resolved]
+    exprs.append(f"'{fname}'" if parts else "SPLIT_PART(METADATA$FILENAME, '/', -1)")
+    source, files = stage_source(stage_ref, fname, parts)
+
+    print("COPY tipado directo a la tabla final …")
+    with span("copy_typed", file=fname) as sp:
+        cur.execute(f"""
+            COPY INTO {table_ref} ({", ".join(targets)})
+            FROM (
+                SELECT {", ".join(exprs)}
+                FROM {source}
+            )
+            {files}
+            FILE_FORMAT = (TYPE=PARQUET USE_VECTORIZED_SCANNER=TRUE)
+            ON_ERROR = ABORT_STATEMENT
+            FORCE = TRUE
+        """)
+        # resultado del COPY: (file, status, rows_parsed, rows_loaded, ...)
+        sp["rows"] = sum(int(row[3] or 0) for row in cur.fetchall())
+    return sp["rows"]
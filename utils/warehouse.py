@@ -0,0 +1,55 @@
+# backend de warehouse de los loaders: Snowflake (default) o DuckDB embebido
+#
+#   WAREHOUSE_BACKEND=snowflake   pool de sesiones de utils.snowflake_pool
+#   WAREHOUSE_BACKEND=duckdb      base local de utils.duckdb_backend (DUCKDB_PATH)
+#
+# Los loaders usan acquire_connection / release_connection / close_all de acá y
+# no saben contra qué motor corren: el SQL que emiten es el de Snowflake y el
+# backend DuckDB lo traduce. La variable se lee en cada llamada, así un proceso
+# (p. ej. benchmarks/) puede elegir el backend antes de la primera conexión.
+
+import os
+from utils import snowflake_pool
+
+BACKENDS = ("snowflake", "duckdb")
+
+
+def backend_name():
+    """
+    Backend elegido con WAREHOUSE_BACKEND (snowflake si no está definida).
+    """
+    name = (os.environ.get("WAREHOUSE_BACKEND") or "snowflake").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"WAREHOUSE_BACKEND inválido: {name!r} (opciones: {', '.join(BACKENDS)})")
+    return name
+
+
+def _duckdb():
+    # import diferido: en producción no hace falta duckdb instalado
+    from utils import duckdb_backend
+    return duckdb_backend.get_warehouse()
+
+
+def acquire_connection(schema=None, default_schema="BRONZE"):
+    """
+    Devuelve (conn, database, schema) del backend activo. Mismo contrato que
+    snowflake_pool.acquire_connection; devolver con release_connection.
+    """
+    if backend_name() == "duckdb":
+        return _duckdb().acquire_connection(schema=schema, default_schema=default_schema)
+    return snowflake_pool.acquire_connection(schema=schema, default_schema=default_schema)
+
+
+def release_connection(conn):
+    if backend_name() == "duckdb":
+        return _duckdb().release_connection(conn)
+    return snowflake_pool.release_connection(conn)
+
+
+def close_all():
+    """
+    Fin del backfill: cierra las sesiones libres del pool de Snowflake. Con
+    DuckDB no hay pool (la base queda abierta hasta duckdb_backend.shutdown).
+    """
+    if backend_name() == "snowflake":
+        snowflake_pool.close_all()